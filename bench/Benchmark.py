@@ -0,0 +1,127 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import math
+import sys
+import time
+from contextlib import contextmanager
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of already sorted `samples`."""
+    if len(samples) == 0:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(samples))) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+@contextmanager
+def no_sleep():
+    """Turns `time.sleep` (and all `sleep` imported from it into project modules) into a no-op.
+
+    The patterns and loopers sleep between steps by design, which is not what a benchmark wants to measure. The hardware
+    simulators keep their own reference to `sleep` so their latency model is not affected. The total requested sleep
+    time is collected in the yielded list.
+    """
+    original = time.sleep
+    requested = [0.0]
+
+    def fake_sleep(seconds):
+        requested[0] += seconds
+
+    patched = [module for name, module in list(sys.modules.items())
+               if module is not None and name.split(".")[0] in ["lib", "modules"]
+               and getattr(module, 'sleep', None) is original]
+    time.sleep = fake_sleep
+    for module in patched:
+        module.sleep = fake_sleep
+    try:
+        yield requested
+    finally:
+        time.sleep = original
+        for module in patched:
+            module.sleep = original
+
+
+class Benchmark(object):
+    """Collects latency samples of one benchmark case and summarizes them
+
+    Use as a context manager around the measured work. The wall time and, where `tracemalloc` is available, the memory
+    allocated during the block are recorded.
+    """
+
+    def __init__(self, name, unit):
+        """Constructor
+
+        :param name: name of the benchmark case
+        :param unit: what one sample represents, e.g. `frames`, `evaluations`, `messages`
+        """
+        self.name = name
+        self.unit = unit
+        self.samples = []
+        self.elapsed = 0.0
+        self.allocated = None
+        self.allocated_peak = None
+        self.extra = {}
+        self.__started = None
+        self.__tracing = False
+
+    def __enter__(self):
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__tracing = True
+        if tracemalloc is not None:
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.__memory = tracemalloc.get_traced_memory()[0]
+        self.__started = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.elapsed = default_timer() - self.__started
+        if tracemalloc is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            self.allocated = current - self.__memory
+            self.allocated_peak = peak - self.__memory
+            if self.__tracing:
+                tracemalloc.stop()
+        return False
+
+    def time(self, function, *args, **kwargs):
+        """Calls the `function` and records its duration as one sample."""
+        started = default_timer()
+        result = function(*args, **kwargs)
+        self.samples.append(default_timer() - started)
+        return result
+
+    def sample(self, seconds):
+        """Records an externally measured sample."""
+        self.samples.append(seconds)
+
+    def result(self):
+        """Summary of the benchmark case as a JSON serializable dictionary. Latencies are in milliseconds."""
+        samples = sorted(self.samples)
+        count = len(samples)
+        result = {
+            'name': self.name,
+            'unit': self.unit,
+            'count': count,
+            'elapsed_s': round(self.elapsed, 6),
+            'per_sec': round(count / self.elapsed, 3) if self.elapsed > 0 else None,
+            'mean_ms': round(sum(samples) * 1000.0 / count, 6) if count > 0 else None,
+            'p50_ms': round(percentile(samples, 50) * 1000.0, 6) if count > 0 else None,
+            'p99_ms': round(percentile(samples, 99) * 1000.0, 6) if count > 0 else None,
+            'max_ms': round(samples[-1] * 1000.0, 6) if count > 0 else None,
+            'allocated_bytes': self.allocated,
+            'allocated_peak_bytes': self.allocated_peak
+        }
+        result.update(self.extra)
+        return result
@@ -0,0 +1,31 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+from bench.Benchmark import Benchmark, no_sleep
+
+MESSAGE = "|c|raspi-project\nLine 2 of the display\nLine 3\nLine 4{:100:}Second page\nwith two lines"
+
+
+def run(bursts=50):
+    """Posts multi-page messages to the LCD and drains the message queue through the looper.
+
+    One sample is one `post` of the whole message plus all the looper iterations needed to display it on the simulated
+    I2C display.
+    """
+    from modules.LCD import LCD
+
+    with no_sleep():
+        module = LCD()
+
+        def burst():
+            module.post(MESSAGE)
+            while len(getattr(module, '_LCD__message_queue')) > 0:
+                module.looper()
+
+        benchmark = Benchmark("lcd/post", "messages")
+        with benchmark:
+            for _ in range(bursts):
+                benchmark.time(burst)
+    return [benchmark.result()]
@@ -0,0 +1,71 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+from bench.Benchmark import Benchmark
+from lib.Module import Module
+
+LISTENERS = 15
+SUBTOPICS = ["", "state", "0", "set", "color/0"]
+
+
+class LoopbackClient(object):
+    """Stand-in for `paho.mqtt.client.Client` which never touches the network and records the publishes"""
+
+    def __init__(self, client_id=""):
+        self.client_id = client_id
+        self.published = []
+
+    def __getattr__(self, name):  # connect, will_set, reconnect_delay_set, loop_forever, disconnect, ...
+        return lambda *args, **kwargs: None
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+
+class Message(object):
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def listener_class(index):
+    def on_mqtt_message(self, path, payload):
+        self.received = self.received + 1
+
+    return type("BenchListener" + str(index), (Module,), {'received': 0, 'on_mqtt_message': on_mqtt_message})
+
+
+def run(messages=5000):
+    """Dispatches incoming control messages to `LISTENERS` registered modules.
+
+    One sample is one message going through `MQTT.__on_message` down to the listener's `on_mqtt_message`.
+    """
+    import modules.MQTT
+    original = modules.MQTT.mqtt.Client
+    modules.MQTT.mqtt.Client = LoopbackClient
+    try:
+        module = modules.MQTT.MQTT("bench", "localhost")
+    finally:
+        modules.MQTT.mqtt.Client = original
+
+    listeners = [listener_class(i)() for i in range(LISTENERS)]
+    for listener in listeners:
+        module.register(listener)
+
+    inbound = []
+    for i in range(messages):
+        subtopic = SUBTOPICS[i % len(SUBTOPICS)]
+        topic = "bench/control/bench-listener" + str(i % LISTENERS) + ("/" + subtopic if subtopic != "" else "")
+        inbound.append(Message(topic, b"ON"))
+
+    on_message = getattr(module, '_MQTT__on_message')
+    benchmark = Benchmark("mqtt/dispatch", "messages")
+    with benchmark:
+        for message in inbound:
+            benchmark.time(on_message, module.client, None, message)
+    benchmark.extra['listeners'] = len(module.listeners)
+    benchmark.extra['delivered'] = sum(listener.received for listener in listeners)
+    module.finalize()
+    return [benchmark.result()]
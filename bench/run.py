@@ -0,0 +1,81 @@
+#!/usr/bin/env python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+# Runs the benchmark suite against the simulated hardware and writes the results as JSON.
+#
+# Usage (from the project's root): python -m bench.run [--output=file.json] [--only=ws281x,...] [--instant]
+#
+import getopt
+import json
+import platform
+import sys
+import time
+
+from lib import Simulator
+
+SUITES = ["ws281x", "state_machine", "lcd", "mqtt"]
+
+
+def help():
+    print("""Usage: python -m bench.run [options]
+
+Options:
+  -h, --help                                 This screen
+  -o, --output=file                          Write the JSON results to a file instead of the standard output
+      --only=suite[,suite[,...]]             Run only the selected suites: """ + ", ".join(SUITES) + """
+      --instant                              Simulate the hardware without any latency""")
+
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "ho:", ["help", "output=", "only=", "instant"])
+    except getopt.GetoptError as e:
+        help()
+        print("\nError: ", e.msg)
+        sys.exit(1)
+
+    output = None
+    suites = SUITES
+    latency = True
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            help()
+            sys.exit()
+        elif opt in ("-o", "--output"):
+            output = arg
+        elif opt == "--only":
+            suites = [suite.replace("-", "_") for suite in arg.split(",")]
+        elif opt == "--instant":
+            latency = False
+
+    Simulator.install(with_latency=latency)
+
+    stdout = sys.stdout
+    sys.stdout = sys.stderr  # Keep module logging out of the JSON document
+    try:
+        results = []
+        for suite in suites:
+            module = __import__("bench." + suite, fromlist=[suite])
+            results.extend(module.run())
+    finally:
+        sys.stdout = stdout
+
+    document = json.dumps({
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'hardware': "simulator" if latency else "simulator-instant",
+        'results': results
+    }, indent=2, sort_keys=True)
+
+    if output is None:
+        print(document)
+    else:
+        with open(output, "w") as fp:
+            fp.write(document + "\n")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
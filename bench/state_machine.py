@@ -0,0 +1,91 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import os
+import shutil
+import tempfile
+
+import yaml
+
+from bench.Benchmark import Benchmark, no_sleep
+
+BUTTONS = 32
+INDICATORS = 32
+STATES = 4
+CONDITIONS_PER_BUTTON = 8
+
+
+def description():
+    """Synthetic state machine description with `STATES` states of `BUTTONS * CONDITIONS_PER_BUTTON` conditions each."""
+    devices = {}
+    for i in range(BUTTONS):
+        devices['btn_' + str(i)] = {'kind': 'mcp23017', 'key': i}
+    for i in range(INDICATORS):
+        devices['rgb_' + str(i)] = {'kind': 'ws281x-indicators', 'key': i}
+
+    colors = ['color_black', 'color_red', 'color_green', 'color_blue']
+    variables = {
+        'color_black': {'pattern': 'light', 'color': {'red': 0, 'green': 0, 'blue': 0}},
+        'color_red': {'pattern': 'light', 'color': {'red': 32, 'green': 0, 'blue': 0}},
+        'color_green': {'pattern': 'light', 'color': {'red': 0, 'green': 32, 'blue': 0}},
+        'color_blue': {'pattern': 'fadeToggle', 'color': {'red': 0, 'green': 0, 'blue': 32}, 'wait': 5, 'min': 5,
+                       'max': 80}
+    }
+
+    states = []
+    for s in range(STATES):
+        conditions = [{'actions': [{'name': 'rgb_' + str(i), 'value': 'color_black'} for i in range(INDICATORS)]}]
+        for button in range(BUTTONS):
+            for c in range(CONDITIONS_PER_BUTTON):
+                other = (button + c + 1) % BUTTONS
+                conditions.append({
+                    'expressions': [{'name': 'btn_' + str(button), 'value': c % 2 == 0},
+                                    {'name': 'btn_' + str(other), 'value': c % 4 < 2}],
+                    'actions': [{'name': 'rgb_' + str((button + c) % INDICATORS), 'value': colors[c % len(colors)]}]
+                })
+        conditions.append({
+            'expressions': [{'name': 'btn_0', 'value': True}, {'name': 'btn_1', 'value': True}],
+            'actions': [{'kind': 'GOTO', 'key': 'state_' + str((s + 1) % STATES), 'value': 0}]
+        })
+        states.append({'name': 'state_' + str(s), 'conditions': conditions})
+
+    return {'devices': devices, 'vars': variables, 'states': states}
+
+
+def run(evaluations=2000):
+    """Loads a synthetic description and toggles MCP23017 inputs.
+
+    One sample is one `set_state` call including the evaluation of the current state's conditions.
+    """
+    from modules.StateMachine import StateMachine
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "state-machine.yml")
+        with open(path, "w") as fp:
+            yaml.safe_dump(description(), fp)
+
+        results = []
+        with no_sleep():
+            module = StateMachine(description_file=path)
+            load = Benchmark("state-machine/load", "loads")
+            with load:
+                load.time(module.initialize)  # from the source description
+                load.time(module.initialize)  # from the cached description
+            load.extra['conditions'] = STATES * (BUTTONS * CONDITIONS_PER_BUTTON + 2)
+            load.extra['cold_ms'] = round(load.samples[0] * 1000.0, 3)
+            load.extra['warm_ms'] = round(load.samples[1] * 1000.0, 3)
+            results.append(load.result())
+
+            evaluate = Benchmark("state-machine/evaluate", "evaluations")
+            with evaluate:
+                for i in range(evaluations):
+                    evaluate.time(module.set_state, "mcp23017", (i * 7) % BUTTONS, (i // BUTTONS) % 2 == 0)
+            evaluate.extra['conditions_per_state'] = BUTTONS * CONDITIONS_PER_BUTTON + 2
+            results.append(evaluate.result())
+        module.finalize()
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,94 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import json
+import os
+import sys
+from glob import glob
+from timeit import default_timer
+
+from bench.Benchmark import Benchmark, no_sleep
+from lib import FrameClock, Simulator
+
+# Strip geometry the test configurations were written for: (led_count, row_led_count, row_count)
+GEOMETRIES = {
+    '50': (50, 24, 2),
+    '100': (100, 24, 4)
+}
+
+PATTERN_METHODS = {
+    'wipe': 'wipe',
+    'light': 'light',
+    'rotation': 'rotation',
+    'spin': 'spin',
+    'chaise': 'chaise',
+    'lighthouse': 'lighthouse',
+    'fade': 'fade',
+    'fadeToggle': 'fade_toggle',
+    'blink': 'blink',
+    'theater': 'theater',
+    'theaterChaiseRainbow': 'theater_chase_rainbow',
+    'rainbow': 'rainbow',
+    'rainbowCycle': 'rainbow_cycle'
+}
+
+
+class RecordingNeoPixel(Simulator.Adafruit_NeoPixel):
+    """Simulated strip recording the time of each `show()`"""
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingNeoPixel, self).__init__(*args, **kwargs)
+        self.timestamps = []
+
+    def show(self):
+        super(RecordingNeoPixel, self).show()
+        self.timestamps.append(default_timer())
+
+
+def run(config_dir="test"):
+    """Plays each WS281x pattern configuration from `config_dir` once.
+
+    One sample is the time between two consecutive frames, i.e., rendering plus pushing to the strip plus the simulated
+    wire time. The pattern's own waits are skipped: the frame clock runs on a fake clock advanced by the skipped sleeps,
+    so its deadlines stay in step and frames rendered slower than their wait are still dropped.
+    """
+    sys.modules['neopixel'].Adafruit_NeoPixel = RecordingNeoPixel
+    from modules.WS281x import WS281x, to_configs
+
+    results = []
+    strips = {}
+    for path in sorted(glob(os.path.join(config_dir, "*.conf"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        geometry = GEOMETRIES.get(name.rsplit("-", 1)[-1], GEOMETRIES['50'])
+        if geometry not in strips:
+            strips[geometry] = WS281x(led_count=geometry[0], row_led_count=geometry[1], row_count=geometry[2])
+        module = strips[geometry]
+        strip = getattr(module, '_WS281x__strip')
+
+        clock = FrameClock.FrameClock()  # The deadlines of a previous run are on a different fake clock
+        setattr(module, '_WS281x__clock', clock)
+
+        benchmark = Benchmark("ws281x/" + name, "frames")
+        with no_sleep() as requested:
+            real_monotonic = FrameClock.monotonic
+            FrameClock.monotonic = lambda: real_monotonic() + requested[0]
+            try:
+                with benchmark:
+                    for config in to_configs(json.load(open(path))):
+                        del strip.timestamps[:]
+                        started = default_timer()
+                        getattr(module, PATTERN_METHODS[config.pattern])(config)
+                        previous = started
+                        for timestamp in strip.timestamps:
+                            benchmark.sample(timestamp - previous)
+                            previous = timestamp
+            finally:
+                FrameClock.monotonic = real_monotonic
+        benchmark.extra['leds'] = geometry[0]
+        benchmark.extra['requested_wait_s'] = round(requested[0], 3)
+        benchmark.extra['late_frames'] = clock.late
+        benchmark.extra['dropped_frames'] = clock.dropped
+        results.append(benchmark.result())
+    return results
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from lib.Util import gettid, monotonic, thread_cpu_time
+
+
+class LooperHandle(object):
+    """Stands in for the looper's thread, see `ModuleLooper.start`"""
+
+    def __init__(self, future):
+        self.future = future
+
+    def join(self, timeout=None):
+        wait([self.future], timeout)
+
+    def is_alive(self):
+        return not self.future.done()
+
+
+class AsyncRuntime(object):
+    """Runs the loopers of all modules on one asyncio event loop (Python 3 only)
+
+    A looper implementing `looper_async()` is iterated on the event loop: the method is called on the loop's thread and
+    must not block, it returns an awaitable (e.g. `self.runtime.sleep(seconds)` instead of `time.sleep(seconds)`) which
+    is awaited before the next iteration. Loopers implementing only the blocking `looper()` are iterated in a thread
+    pool, so they keep working unchanged but still need a thread while they block. Blocking work of a `looper_async()`
+    (e.g. I2C transactions) is run in the thread pool as well with `self.runtime.run(function)`.
+
+    The CPU time a looper consumes in the thread pool is accounted to the looper's `stats()`, the time spent on the
+    event loop's thread is not.
+
+    The runtime does not use the `async` syntax itself, so that the modules can provide `looper_async()` while staying
+    compatible with Python 2.
+    """
+
+    def __init__(self, workers=32):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(workers))
+        self.__thread = threading.Thread(target=self.__run, name="AsyncRuntime")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def start(self, looper):
+        """Starts iterating the `looper` until it is interrupted.
+
+        :return: a `LooperHandle` to join the looper with
+        """
+        future = Future()
+        self.loop.call_soon_threadsafe(self.__iterate, looper, future)
+        return LooperHandle(future)
+
+    def sleep(self, seconds):
+        """Awaitable completing after `seconds`, to be returned from `looper_async()`"""
+        return asyncio.sleep(seconds)
+
+    def run(self, function, *args):
+        """Awaitable running the blocking `function(*args)` in the thread pool
+
+        The CPU time is accounted to the looper if `function` is one of its methods.
+        """
+        looper = getattr(function, '__self__', None)
+        if hasattr(looper, '_looper_cpu'):
+            return self.loop.run_in_executor(None, self.__timed, looper, function, *args)
+        return self.loop.run_in_executor(None, function, *args)
+
+    def then(self, awaitable, function):
+        """Awaitable awaiting the `awaitable` and then the awaitable returned by `function(result)`
+
+        E.g. `self.runtime.then(self.runtime.run(self.read), self.runtime.sleep)` sleeps for the seconds returned by
+        the blocking `read()`. The `function` is called on the loop's thread.
+        """
+        future = self.loop.create_future()
+
+        def first_done(first):
+            if self.__relay_failure(first, future):
+                return
+            try:
+                second = asyncio.ensure_future(function(first.result()), loop=self.loop)
+            except Exception as e:
+                future.set_exception(e)
+                return
+            second.add_done_callback(second_done)
+
+        def second_done(second):
+            if not self.__relay_failure(second, future):
+                future.set_result(second.result())
+
+        asyncio.ensure_future(awaitable, loop=self.loop).add_done_callback(first_done)
+        return future
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.__thread.join(5)
+
+    def __run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def __iterate(self, looper, future):
+        if looper.is_interrupted():
+            looper._looper_exited()
+            future.set_result(None)
+            return
+        start = monotonic()
+        try:
+            if hasattr(looper, 'looper_async'):
+                awaitable = asyncio.ensure_future(looper.looper_async(), loop=self.loop)
+            else:
+                awaitable = self.loop.run_in_executor(None, self.__timed, looper, looper.looper)
+        except Exception:
+            looper._looper_failed()
+            self.__done(looper, future, start, None)
+            return
+        awaitable.add_done_callback(lambda done: self.__done(looper, future, start, done))
+
+    def __done(self, looper, future, start, done):
+        if done is not None:
+            try:
+                done.result()
+            except Exception:
+                looper._looper_failed()
+        looper._looper_done(start)
+        self.loop.call_soon(self.__iterate, looper, future)
+
+    @staticmethod
+    def __relay_failure(source, target):
+        """Cancels or fails the `target` future as the done `source` one, returns whether it did"""
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            return False
+        return True
+
+    @staticmethod
+    def __timed(looper, function, *args):
+        thread_id = gettid()
+        start = thread_cpu_time(thread_id) or 0.0
+        try:
+            return function(*args)
+        finally:
+            looper._looper_cpu((thread_cpu_time(thread_id) or 0.0) - start)
@@ -0,0 +1,155 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import threading
+import traceback
+from collections import deque
+
+from lib.Logger import Logger
+from lib.Metrics import METRICS
+from lib.Scheduler import Scheduler
+from lib.Util import monotonic
+
+
+class Subscription(object):
+    """Subscription of a listener's `callback` to an event of a producer"""
+
+    def __init__(self, event, module_id, callback, asynchronous):
+        self.event = event
+        self.module_id = module_id
+        self.callback = callback
+        self.asynchronous = asynchronous
+        self.pending = deque()
+        self.scheduled = False
+        self.lock = threading.Lock()
+
+
+class EventBus(object):
+    """Delivers the events of the modules to their listeners
+
+    The subscriptions are kept in a tuple per producer and event, so publishing an event costs one dictionary lookup
+    and the calls of its subscribers. A subscription may be delivered asynchronously on the bus' own worker pool, so
+    that a slow listener does not stall the producer (e.g. a sensor's looper). The pool is not shared with the timer
+    callbacks of the `SCHEDULER`, so slow listeners do not delay e.g. a safety timeout either. The events of an
+    asynchronous subscription are delivered in order, one at a time, and dropped when more than `max_pending` are
+    waiting.
+
+    Every delivery is recorded in the listener's `listener` histogram (see `lib.Metrics`), the time an asynchronous
+    event waited in the listener's `delivery` histogram. The number of published, delivered and dropped events is
+    counted per event.
+    """
+
+    def __init__(self, asynchronous=False, max_pending=1000, pool=None):
+        """Constructor
+
+        :param asynchronous: whether to deliver the events asynchronously unless specified otherwise on subscription
+        :param max_pending: maximum number of events waiting for an asynchronous subscriber
+        :param pool: the `Scheduler` to deliver asynchronous events with, one with 4 workers created on the first
+                     asynchronous event by default
+        """
+        self.asynchronous = asynchronous
+        self.max_pending = max_pending
+        self.pool = pool
+        self.logger = Logger(type(self).__name__)
+        self.__subscriptions = {}
+        self.__counters = {}
+        self.__lock = threading.Lock()
+
+    def subscribe(self, producer, event, callback, module_id=None, asynchronous=None):
+        """Subscribes the `callback` to the `event` (e.g. `on_rgb_change`) published by the `producer`.
+
+        :param module_id: the listener's module ID the deliveries are recorded for
+        :param asynchronous: whether to deliver the events asynchronously, the bus' default if `None`
+        """
+        subscription = Subscription(event, module_id or getattr(callback, '__name__', str(callback)), callback,
+                                    self.asynchronous if asynchronous is None else asynchronous)
+        with self.__lock:
+            key = (producer, event)
+            self.__subscriptions[key] = self.__subscriptions.get(key, ()) + (subscription,)
+            if event not in self.__counters:
+                self.__counters[event] = [0, 0, 0]
+        return subscription
+
+    def unsubscribe(self, producer):
+        """Removes all subscriptions to the events of the `producer`."""
+        with self.__lock:
+            for key in [key for key in self.__subscriptions.keys() if key[0] is producer]:
+                del self.__subscriptions[key]
+
+    def subscribers(self, producer, event):
+        """Number of subscriptions to the `event` of the `producer`"""
+        return len(self.__subscriptions.get((producer, event), ()))
+
+    def publish(self, producer, event, *args):
+        """Delivers the `event` of the `producer` with the `args` to its subscribers."""
+        subscriptions = self.__subscriptions.get((producer, event), ())
+        counters = self.__counters.get(event, None)
+        if counters is not None:
+            counters[0] = counters[0] + 1
+        for subscription in subscriptions:
+            if subscription.asynchronous:
+                self.__enqueue(subscription, args, counters)
+                continue
+            start = monotonic()
+            try:
+                subscription.callback(*args)
+            finally:
+                METRICS.observe(subscription.module_id, "listener", event, monotonic() - start)
+                counters[1] = counters[1] + 1
+
+    def shutdown(self):
+        """Stops the worker pool, the events still pending are dropped."""
+        with self.__lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+    def stats(self):
+        """Dictionary of the `published`, `delivered` and `dropped` counts by event"""
+        with self.__lock:
+            return dict((event, {'published': published, 'delivered': delivered, 'dropped': dropped})
+                        for event, (published, delivered, dropped) in self.__counters.items())
+
+    def __enqueue(self, subscription, args, counters):
+        with subscription.lock:
+            if len(subscription.pending) >= self.max_pending:
+                counters[2] = counters[2] + 1
+                return
+            subscription.pending.append((monotonic(), args))
+            if subscription.scheduled:
+                return
+            subscription.scheduled = True
+        pool = self.pool
+        if pool is None:
+            with self.__lock:
+                if self.pool is None:
+                    self.pool = Scheduler(workers=4)
+                pool = self.pool
+        pool.submit(self.__drain, subscription, counters)
+
+    def __drain(self, subscription, counters):
+        while True:
+            with subscription.lock:
+                if len(subscription.pending) == 0:
+                    subscription.scheduled = False
+                    return
+                published, args = subscription.pending.popleft()
+            METRICS.observe(subscription.module_id, "delivery", subscription.event, monotonic() - published)
+            try:
+                self.__deliver(subscription, args, counters)
+            except:
+                self.logger.error("Delivering %s to %s failed", subscription.event, subscription.module_id)
+                traceback.print_exc()
+
+    @staticmethod
+    def __deliver(subscription, args, counters):
+        start = monotonic()
+        try:
+            subscription.callback(*args)
+        finally:
+            METRICS.observe(subscription.module_id, "listener", subscription.event, monotonic() - start)
+            counters[1] = counters[1] + 1
+
+
+BUS = EventBus()
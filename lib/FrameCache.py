@@ -0,0 +1,69 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+from collections import OrderedDict
+
+import numpy
+
+
+class FrameCache(object):
+    """Least recently used cache of compiled animations
+
+    An animation is a `(frames, waits)` tuple of a 2D `uint32` array with one frame per row and an array of per-frame
+    delays in ms. The cache is bounded by the total size of the stored arrays in bytes, least recently played animations
+    are evicted first.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__animations = OrderedDict()
+
+    def __len__(self):
+        return len(self.__animations)
+
+    def get(self, key):
+        """Animation stored under `key` or `None`"""
+        animation = self.__animations.pop(key, None)
+        if animation is None:
+            self.misses = self.misses + 1
+        else:
+            self.hits = self.hits + 1
+            self.__animations[key] = animation
+        return animation
+
+    def put(self, key, frames, waits):
+        """Compiles the list of `frames` and `waits` into an animation stored under `key`.
+
+        Animations which would not fit into the cache on their own are not stored.
+        """
+        if len(frames) == 0 or not self.fits(len(frames), frames[0].nbytes):
+            return None
+        animation = (numpy.array(frames, dtype=numpy.uint32), numpy.array(waits))
+        self.__remove(key)
+        while self.size + self.__size_of(animation) > self.max_size:
+            self.__remove(next(iter(self.__animations)))
+        self.__animations[key] = animation
+        self.size = self.size + self.__size_of(animation)
+        return animation
+
+    def fits(self, count, frame_size):
+        """Whether an animation of `count` frames `frame_size` bytes each can be stored at all"""
+        return count * (frame_size + numpy.dtype(numpy.int64).itemsize) <= self.max_size
+
+    def clear(self):
+        self.__animations.clear()
+        self.size = 0
+
+    def __remove(self, key):
+        animation = self.__animations.pop(key, None)
+        if animation is not None:
+            self.size = self.size - self.__size_of(animation)
+
+    @staticmethod
+    def __size_of(animation):
+        return animation[0].nbytes + animation[1].nbytes
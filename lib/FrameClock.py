@@ -0,0 +1,82 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import time
+
+from lib.Util import monotonic
+
+
+class FrameClock(object):
+    """Paces frames against absolute deadlines of a monotonic clock
+
+    Every frame has a deadline: the previous frame's deadline plus the previous frame's wait. Sleeping until the deadline
+    instead of sleeping the wait after each frame keeps the rendering and showing time from accumulating as drift.
+
+    A frame whose whole wait already passed when it is due is dropped, unless it is the last frame of an animation.
+    Falling behind by more than `max_lag` seconds (e.g. after the looper was stopped) resynchronizes the clock instead of
+    dropping all the frames in between.
+    """
+
+    def __init__(self, max_lag=1.0, tolerance=0.002):
+        self.max_lag = max_lag
+        self.tolerance = tolerance
+        self.shown = 0
+        self.late = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self.fps = 0.0
+        self.__deadline = None
+        self.__window_start = None
+        self.__window_frames = 0
+
+    def due(self, wait, last=False):
+        """Whether the next frame, shown for `wait` ms, should be shown (`True`) or dropped (`False`)."""
+        now = monotonic()
+        if self.__deadline is None or now - self.__deadline > self.max_lag:
+            if self.__deadline is not None:
+                self.resyncs = self.resyncs + 1
+            self.__deadline = now
+        elif not last and now >= self.__deadline + wait / 1000.0:
+            self.__deadline = self.__deadline + wait / 1000.0
+            self.dropped = self.dropped + 1
+            return False
+        elif now - self.__deadline > self.tolerance:
+            self.late = self.late + 1
+        return True
+
+    def tick(self, wait):
+        """Counts a shown frame and sleeps until the deadline of the next one."""
+        self.shown = self.shown + 1
+        self.__measure()
+        self.sleep(wait)
+
+    def sleep(self, wait):
+        """Sleeps until `wait` ms after the current deadline."""
+        if self.__deadline is None:
+            self.__deadline = monotonic()
+        self.__deadline = self.__deadline + wait / 1000.0
+        delay = self.__deadline - monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self):
+        return {
+            'fps': round(self.fps, 2),
+            'shown': self.shown,
+            'late': self.late,
+            'dropped': self.dropped,
+            'resyncs': self.resyncs
+        }
+
+    def __measure(self):
+        now = monotonic()
+        if self.__window_start is None:
+            self.__window_start = now
+            return
+        self.__window_frames = self.__window_frames + 1
+        if now - self.__window_start >= 1.0:
+            self.fps = self.__window_frames / (now - self.__window_start)
+            self.__window_start = now
+            self.__window_frames = 0
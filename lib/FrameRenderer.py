@@ -0,0 +1,310 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import numpy
+
+from lib.ColorGRB import ColorGRB
+
+
+def wheel(pos):
+    """Generate rainbow colors across 0-255 positions."""
+    if pos < 85:
+        return ColorGRB(pos * 3, 255 - pos * 3, 0)
+    elif pos < 170:
+        pos -= 85
+        return ColorGRB(255 - pos * 3, 0, pos * 3)
+    else:
+        pos -= 170
+        return ColorGRB(0, pos * 3, 255 - pos * 3)
+
+
+WHEEL = numpy.array([wheel(pos) for pos in range(256)], dtype=numpy.uint32)
+
+
+def scale(colors, factors):
+    """Scales each channel of `colors` by `factors` (both array-likes, broadcast against each other).
+
+    Same as `ColorGRB(int(red * factor), int(green * factor), int(blue * factor))` for each color.
+    """
+    colors = numpy.asarray(colors, dtype=numpy.int64)
+    factors = numpy.asarray(factors, dtype=numpy.float64)
+    red = (((colors >> 8) & 255) * factors).astype(numpy.int64)
+    green = (((colors >> 16) & 255) * factors).astype(numpy.int64)
+    blue = ((colors & 255) * factors).astype(numpy.int64)
+    return ((red << 8) | (green << 16) | blue).astype(numpy.uint32)
+
+
+def push(strip, frame):
+    """Pushes a whole `frame` to the strip's LED buffer in one bulk call (without showing it)."""
+    if hasattr(strip, '_led_data'):
+        strip._led_data[0:len(frame)] = frame.tolist()
+    else:
+        for led, color in enumerate(frame.tolist()):
+            strip.setPixelColor(led, color)
+
+
+class FrameRenderer(object):
+    """Renders the WS281x patterns as whole frames
+
+    A frame is a `uint32` array with one color per LED in logical order (index 0 being the first LED of the first row).
+    Each pattern is a generator of `(frame, wait)` tuples where `wait` is the time in ms the frame should stay on before
+    the next one. The frames are never modified after being yielded.
+
+    The renderer keeps the last rendered frame in `buffer` since some patterns only change part of the LEDs. Patterns in
+    `STATELESS` always render all LEDs, so their frames depend on the config only.
+    """
+
+    STATELESS = ['light', 'rotation', 'spin', 'chaise', 'lighthouse', 'fade', 'fadeToggle', 'blink', 'rainbow',
+                 'rainbowCycle']
+
+    def __init__(self, led_count, row_led_count, row_count):
+        self.led_count = led_count
+        self.row_led_count = row_led_count
+        self.row_count = row_count
+        self.rest_count = int(led_count - (row_led_count * row_count))
+        self.row_pixels = row_led_count * row_count
+        self.buffer = numpy.zeros(led_count, dtype=numpy.uint32)
+        self.__row_offsets = numpy.arange(row_count) * row_led_count
+
+    def render(self, config):
+        """Frames of the `config`'s pattern or `None` for an unknown pattern."""
+        pattern = {
+            'wipe': self.wipe,
+            'light': self.light,
+            'rotation': self.rotation,
+            'spin': self.spin,
+            'chaise': self.chaise,
+            'lighthouse': self.lighthouse,
+            'fade': self.fade,
+            'fadeToggle': self.fade_toggle,
+            'blink': self.blink,
+            'theater': self.theater,
+            'theaterChaiseRainbow': self.theater_chase_rainbow,
+            'rainbow': self.rainbow,
+            'rainbowCycle': self.rainbow_cycle
+        }.get(config.pattern, None)
+        return pattern(config) if pattern is not None else None
+
+    def color_wipe(self, color, wait_ms=50):
+        """Wipe color across display a pixel at a time."""
+        frame = self.buffer
+        for i in range(self.led_count):
+            frame = frame.copy()
+            frame[i] = color
+            yield self.__frame(frame, wait_ms)
+
+    def theater(self, config):
+        """Movie theater light style chaser animation."""
+        colors, frame = self.__start(config)
+        row_colors = self.__row_colors(colors)
+        for j in range(config.fading):  # iterations
+            for q in range(3):
+                index = self.__clip((numpy.arange(0, self.row_led_count, 3) + q)[:, None] + self.__row_offsets[None, :])
+                frame = frame.copy()
+                frame[index[0]] = numpy.broadcast_to(row_colors[None, :], index[1]).ravel()[index[2]]
+                yield self.__frame(frame, config.wait)
+                frame = frame.copy()
+                frame[index[0]] = 0
+        self.buffer = frame
+
+    def rainbow(self, config):
+        """Draw rainbow that fades across all pixels at once."""
+        colors, frame = self.__start(config)
+        pixels = numpy.arange(self.row_pixels)
+        for j in range(256 * config.fading):  # iterations
+            frame = frame.copy()
+            frame[:self.row_pixels] = WHEEL[(pixels + j) & 255]
+            yield self.__frame(frame, config.wait)
+
+    def rainbow_cycle(self, config):
+        """Draw rainbow that uniformly distributes itself across all pixels."""
+        colors, frame = self.__start(config)
+        positions = numpy.arange(self.row_pixels) * 256 // self.led_count
+        for j in range(256 * config.fading):  # iterations
+            frame = frame.copy()
+            frame[:self.row_pixels] = WHEEL[(positions + j) & 255]
+            yield self.__frame(frame, config.wait)
+
+    def theater_chase_rainbow(self, config):
+        """Rainbow movie theater light style chaser animation."""
+        colors, frame = self.__start(config)
+        starts = numpy.arange(0, self.row_pixels, 3)
+        for j in range(256):
+            for q in range(3):
+                index = self.__clip(starts + q)
+                frame = frame.copy()
+                frame[index[0]] = WHEEL[(starts + j) % 255][index[2]]
+                yield self.__frame(frame, config.wait)
+                frame = frame.copy()
+                frame[index[0]] = 0
+        self.buffer = frame
+
+    def wipe(self, config, row_colors=None):
+        """Wipe color across display a pixel at a time."""
+        colors, frame = self.__start(config)
+        row_colors = self.__row_colors(colors) if row_colors is None else row_colors
+        frames = []
+        for i in range(self.row_led_count):
+            frame = frame.copy()
+            frame[i + self.__row_offsets] = row_colors
+            frames.append(frame)
+
+        for index, frame in enumerate(frames):
+            last = index == len(frames) - 1
+            yield self.__frame(frame, config.wait + (config.fading if last and config.fading > 0 else 0))
+        if config.fading > 0:
+            copy = config.clone()
+            copy.fading = 0
+            for item in self.wipe(copy, numpy.zeros(self.row_count, dtype=numpy.uint32)):
+                yield item
+
+    def light(self, config):
+        """Light"""
+        colors, frame = self.__start(config)
+        frame = frame.copy()
+        frame[:self.row_pixels] = numpy.repeat(self.__row_colors(colors), self.row_led_count)
+        yield self.__frame(frame, config.wait)
+
+    def rotation(self, config):
+        """Rotation"""
+        colors, frame = self.__start(config)
+        colors = scale(self.__row_colors(colors)[:, None], self.__fading_factors(config)[None, :])
+        for i in range(self.row_led_count):
+            j = self.__wrap(i + numpy.arange(config.width))
+            frame = self.__cleared(frame)
+            frame[(j[None, :] + self.__row_offsets[:, None]).ravel()] = colors.ravel()
+            yield self.__frame(frame, config.wait)
+
+    def spin(self, config):
+        """Spin"""
+        use = config.clone()
+        for w in range(5):
+            use.width = self.row_led_count
+            use.fading = 100 // self.row_led_count
+            use.wait = 50 - (w * 10)
+            for item in self.rotation(use):
+                yield item
+        for w in range(3):
+            use.width = self.row_led_count // 2
+            use.fading = 100 // (self.row_led_count // 2)
+            use.wait = 30 - (w * 10)
+            for item in self.lighthouse(use):
+                yield item
+            for item in self.lighthouse(use):
+                yield item
+            use.wait = 50
+        for frame, wait in self.light(use):
+            yield frame, wait + 10000
+
+    def chaise(self, config):
+        """Chaise"""
+        colors, frame = self.__start(config)
+        colors = scale(self.__row_colors(colors)[None, :], self.__fading_factors(config)[:, None])
+        forward = numpy.arange(self.row_count) < self.row_count // 2
+        for i in range(self.row_led_count):
+            position = i + numpy.arange(config.width)
+            backward = numpy.where(self.row_led_count > position,
+                                   self.row_led_count - position - 1,
+                                   self.row_led_count - position - 1 + self.row_led_count)
+            j = numpy.where(forward[None, :], self.__wrap(position)[:, None], backward[:, None])
+            frame = self.__cleared(frame)
+            frame[(j + self.__row_offsets[None, :]).ravel()] = colors.ravel()
+            yield self.__frame(frame, config.wait)
+
+    def lighthouse(self, config):
+        """Lighthouse"""
+        colors, frame = self.__start(config)
+        factors = self.__fading_factors(config)
+        row_colors = self.__row_colors(colors, self.row_count * 2)
+        colors = numpy.stack([scale(row_colors[:self.row_count, None], factors[None, :]),
+                              scale(row_colors[self.row_count:, None], factors[None, :])], axis=2)
+        half = self.row_led_count // 2
+        for i in range(self.row_led_count):
+            j = self.__wrap(i + numpy.arange(config.width))
+            q = self.__wrap(j + half)
+            index = numpy.stack([j, q], axis=1)[None, :, :] + self.__row_offsets[:, None, None]
+            frame = self.__cleared(frame)
+            frame[index.ravel()] = colors.ravel()
+            yield self.__frame(frame, config.wait)
+
+    def fade(self, config):
+        """Fade"""
+        colors, frame = self.__start(config)
+        row_colors = self.__row_colors(colors)
+        for step in range((config.max - config.min) * 2):
+            percent = self.__fade_percent(config, step)
+            frame = frame.copy()
+            frame[:self.row_pixels] = numpy.repeat(scale(row_colors, float(percent) / 100.0), self.row_led_count)
+            yield self.__frame(frame, config.wait)
+
+    def fade_toggle(self, config):
+        """Fade Toggle"""
+        colors, frame = self.__start(config)
+        row_colors = self.__row_colors(colors)
+        toggled = numpy.arange(self.row_count) >= self.row_count // 2
+        for step in range((config.max - config.min) * 2):
+            percent = self.__fade_percent(config, step)
+            factors = numpy.where(toggled,
+                                  float(config.max - percent + config.min) / 100.0,
+                                  float(percent) / 100.0)
+            frame = frame.copy()
+            frame[:self.row_pixels] = numpy.repeat(scale(row_colors, factors), self.row_led_count)
+            yield self.__frame(frame, config.wait)
+
+    def blink(self, config):
+        """Blink"""
+        colors, frame = self.__start(config)
+        frame = frame.copy()
+        frame[:self.row_pixels] = numpy.repeat(self.__row_colors(colors), self.row_led_count)
+        yield self.__frame(frame, config.wait)
+        frame = self.__cleared(frame)
+        yield self.__frame(frame, config.wait)
+
+    def __frame(self, frame, wait):
+        self.buffer = frame
+        return frame, wait
+
+    def __start(self, config):
+        """Colors of the `config` and the initial frame with the top LEDs set."""
+        color_count = 0
+        while getattr(config, 'color' + str(color_count + 1), None) is not None:
+            color_count = color_count + 1
+        colors = [getattr(config, 'color' + str(n + 1)) for n in range(color_count)]
+
+        frame = self.buffer
+        if self.rest_count > 0:
+            frame = frame.copy()
+            frame[self.led_count - self.rest_count:] = [colors[color_count - self.rest_count + i]
+                                                        for i in reversed(range(self.rest_count))]
+        return colors, frame
+
+    def __row_colors(self, colors, count=None):
+        row_color_count = len(colors) - self.rest_count
+        return numpy.array([colors[row % row_color_count] for row in range(self.row_count if count is None else count)],
+                           dtype=numpy.uint32)
+
+    def __cleared(self, frame):
+        frame = frame.copy()
+        frame[:self.row_pixels] = 0
+        return frame
+
+    def __wrap(self, positions):
+        return numpy.where(positions < self.row_led_count, positions, positions - self.row_led_count)
+
+    def __clip(self, index):
+        """Flattened `index` restricted to existing LEDs: (valid indices, shape, mask of valid positions)."""
+        flat = index.ravel()
+        mask = flat < self.led_count
+        return flat[mask], index.shape, mask
+
+    @staticmethod
+    def __fading_factors(config):
+        percent = 100.0 - (config.width - numpy.arange(config.width) - 1).astype(numpy.float64) * float(config.fading)
+        return numpy.maximum(percent, 0.0) / 100.0
+
+    @staticmethod
+    def __fade_percent(config, step):
+        return step + config.min if ((step + config.min) < config.max) else \
+            config.max - (step + config.min - config.max)
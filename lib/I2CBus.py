@@ -0,0 +1,107 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import threading
+
+from lib.Util import monotonic
+
+
+class I2CBus(object):
+    """Shared I2C bus
+
+    Owns the one `smbus.SMBus` handle of the port and serializes the transactions of all the drivers using it, so that
+    transactions of drivers running in different threads do not interleave. A driver may submit a batch of transactions
+    run as one critical section, e.g. to update all registers of a PWM channel at once.
+
+    The number of transactions and the time the bus was held is counted per device address.
+    """
+
+    def __init__(self, port=1):
+        self.port = port
+        self.__smbus = None
+        self.__lock = threading.RLock()
+        self.__stats = {}
+
+    def open(self):
+        """Opens the bus, if not opened yet (`smbus` is imported on first use)."""
+        with self.__lock:
+            if self.__smbus is None:
+                import smbus
+                self.__smbus = smbus.SMBus(self.port)
+            return self.__smbus
+
+    def transaction(self, address, operation, *args):
+        """Runs one `smbus` `operation` (e.g. `'write_byte_data'`) on the device at `address` with the `args`.
+
+        :return: the result of the operation
+        """
+        with self.__lock:
+            bus = self.__smbus or self.open()
+            start = monotonic()
+            try:
+                return getattr(bus, operation)(address, *args)
+            finally:
+                self.__account(address, 1, monotonic() - start)
+
+    def batch(self, address, operations):
+        """Runs the `operations` on the device at `address` as one critical section.
+
+        :param operations: `(operation, arg1, arg2, ...)` tuples, e.g. `('write_byte_data', register, value)`
+        :return: list of the operations' results
+        """
+        with self.__lock:
+            bus = self.__smbus or self.open()
+            start = monotonic()
+            try:
+                return [getattr(bus, operation[0])(address, *operation[1:]) for operation in operations]
+            finally:
+                self.__account(address, len(operations), monotonic() - start)
+
+    def write_byte(self, address, value):
+        return self.transaction(address, 'write_byte', value)
+
+    def read_byte(self, address):
+        return self.transaction(address, 'read_byte')
+
+    def write_byte_data(self, address, register, value):
+        return self.transaction(address, 'write_byte_data', register, value)
+
+    def read_byte_data(self, address, register):
+        return self.transaction(address, 'read_byte_data', register)
+
+    def write_word_data(self, address, register, value):
+        return self.transaction(address, 'write_word_data', register, value)
+
+    def read_word_data(self, address, register):
+        return self.transaction(address, 'read_word_data', register)
+
+    def write_block_data(self, address, register, values):
+        return self.transaction(address, 'write_block_data', register, values)
+
+    def read_block_data(self, address, register):
+        return self.transaction(address, 'read_block_data', register)
+
+    def write_i2c_block_data(self, address, register, values):
+        return self.transaction(address, 'write_i2c_block_data', register, values)
+
+    def read_i2c_block_data(self, address, register, length=32):
+        return self.transaction(address, 'read_i2c_block_data', register, length)
+
+    def stats(self):
+        """Dictionary of the `transactions` count and the bus `seconds` by device address"""
+        with self.__lock:
+            return dict((address, {'transactions': transactions, 'seconds': seconds})
+                        for address, (transactions, seconds) in self.__stats.items())
+
+    def __account(self, address, transactions, seconds):
+        stats = self.__stats.get(address, None)
+        if stats is None:
+            stats = [0, 0.0]
+            self.__stats[address] = stats
+        stats[0] = stats[0] + transactions
+        stats[1] = stats[1] + seconds
+
+
+I2C_BUS = I2CBus(1)
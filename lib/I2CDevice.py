@@ -1,12 +1,13 @@
-﻿import smbus
-from time import *
+﻿from time import *
+
+from lib.I2CBus import I2C_BUS, I2CBus
 
 
 class I2CDevice:
 
     def __init__(self, addr, port=1):
         self.addr = addr
-        self.bus = smbus.SMBus(port)
+        self.bus = I2C_BUS if port == I2C_BUS.port else I2CBus(port)
 
     # Write a single command
     def write_cmd(self, cmd):
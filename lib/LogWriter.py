@@ -0,0 +1,160 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import atexit
+import sys
+import syslog
+import threading
+import time
+import traceback
+from collections import deque
+
+from lib.Util import to_snake_case
+
+
+class LogWriter(object):
+    """Writes log records in a background thread
+
+    Records are appended to a bounded queue, which does not need a lock (`deque.append` and `deque.popleft` are atomic),
+    so logging costs the caller only creating the record. The writer thread prints the records, sends them to syslog
+    and appends them to the log files kept open between the records. Records logged while the queue is full are dropped
+    and counted in `dropped`.
+
+    The last `ring_size` records of every logger are also kept in memory, so they can be dumped on demand even without a
+    log file. A log file left from a previous run is truncated when first written to.
+    """
+
+    def __init__(self, max_size=10000, interval=0.05, ring_size=100):
+        """Constructor
+
+        :param max_size: maximum number of records waiting to be written
+        :param interval: seconds to wait for new records when the queue is empty
+        :param ring_size: number of last records kept in memory per logger
+        """
+        self.max_size = max_size
+        self.interval = interval
+        self.ring_size = ring_size
+        self.dropped = 0
+        self.written = 0
+        self.__queue = deque()
+        self.__rings = {}
+        self.__files = {}
+        self.__truncated = set()
+        self.__reported = 0
+        self.__thread = None
+        self.__closed = False
+        self.__lock = threading.Lock()
+
+    def write(self, record):
+        """Enqueues a `(timestamp, priority, priority_text, name, message, use_syslog, log_file)` record."""
+        if len(self.__queue) >= self.max_size:
+            self.dropped = self.dropped + 1
+            return
+        self.__queue.append(record)
+        if self.__thread is None:
+            self.__start()
+
+    def flush(self, timeout=5.0):
+        """Waits till all the queued records are written (at most `timeout` seconds)."""
+        if self.__thread is None or not self.__thread.is_alive():
+            self.__drain()
+            return
+        deadline = time.time() + timeout
+        while len(self.__queue) > 0 and time.time() < deadline:
+            time.sleep(self.interval / 5.0)
+        with self.__lock:  # The last batch may still be being written
+            pass
+
+    def dump(self, name=None):
+        """Last records of the logger `name` (or its snake-cased module ID) or of all loggers ordered by time."""
+        self.flush()
+        with self.__lock:
+            records = [record for logger_name, ring in self.__rings.items()
+                       if name is None or name == logger_name or name == to_snake_case(logger_name, "-")
+                       for record in ring]
+        return [full_message for timestamp, full_message in sorted(records, key=lambda record: record[0])]
+
+    def close(self):
+        """Writes the queued records and closes the log files."""
+        self.__closed = True
+        if self.__thread is not None and self.__thread.is_alive():
+            self.__thread.join(5.0)
+        self.__drain()
+        with self.__lock:
+            for fp in self.__files.values():
+                try:
+                    fp.close()
+                except IOError:
+                    traceback.print_exc()
+            self.__files = {}
+
+    def __start(self):
+        with self.__lock:
+            if self.__thread is None and not self.__closed:
+                self.__thread = threading.Thread(target=self.__run, name="LogWriter")
+                self.__thread.daemon = True
+                self.__thread.start()
+                atexit.register(self.close)
+
+    def __run(self):
+        while not self.__closed:
+            if not self.__drain():
+                time.sleep(self.interval)
+
+    def __drain(self):
+        """Writes all the queued records, returns whether there were any."""
+        if len(self.__queue) == 0 and self.dropped == self.__reported:
+            return False
+        with self.__lock:
+            touched = set()
+            log_file = None
+            try:
+                while len(self.__queue) > 0:
+                    record = self.__queue.popleft()
+                    log_file = record[6]
+                    self.__write(record, touched)
+                if self.dropped != self.__reported:
+                    dropped = self.dropped - self.__reported
+                    self.__reported = self.dropped
+                    self.__write((time.time(), syslog.LOG_WARNING, "WARN", "Logger", "Dropped " + str(dropped)
+                                  + " log messages", False, log_file), touched)
+            finally:
+                sys.stdout.flush()
+                for log_file in touched:
+                    self.__flush_file(log_file)
+        return True
+
+    def __write(self, record, touched):
+        timestamp, priority, priority_text, name, message, use_syslog, log_file = record
+        full_message = time.ctime(timestamp) + " " + priority_text.ljust(8) + "[" + name.ljust(18) + "]: " + message
+        print(full_message)
+        if self.ring_size > 0:
+            ring = self.__rings.get(name, None)
+            if ring is None or ring.maxlen != self.ring_size:
+                ring = deque([] if ring is None else ring, self.ring_size)
+                self.__rings[name] = ring
+            ring.append((timestamp, full_message))
+        if use_syslog and priority <= syslog.LOG_INFO:
+            syslog.syslog(priority, message)
+        if log_file is not None:
+            try:
+                fp = self.__files.get(log_file, None)
+                if fp is None:
+                    fp = open(log_file, "a" if log_file in self.__truncated else "w")
+                    self.__truncated.add(log_file)
+                    self.__files[log_file] = fp
+                fp.write(full_message + "\n")
+                touched.add(log_file)
+            except IOError:
+                self.__files.pop(log_file, None)
+                traceback.print_exc()
+        self.written = self.written + 1
+
+    def __flush_file(self, log_file):
+        try:
+            self.__files[log_file].flush()
+        except (IOError, KeyError):
+            self.__files.pop(log_file, None)
+            traceback.print_exc()
@@ -3,22 +3,42 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
-import os
 import time
-import traceback
 import syslog
 
+from lib.LogWriter import LogWriter
+
+WRITER = LogWriter()
+DEFAULT_LOG_FILE = "default"
+LOG_FILE = "/var/log/raspi-project.log"
+
+
+def configure(log_file=DEFAULT_LOG_FILE, ring_size=None):
+    """Configures the log file of loggers using the default one and the ring buffer size, unset values are kept.
+
+    :param log_file: default log file, if `None` no log file is used
+    :param ring_size: number of last records kept in memory per logger, `0` keeps none
+    """
+    global LOG_FILE
+    if log_file != DEFAULT_LOG_FILE:
+        LOG_FILE = log_file
+    if ring_size is not None:
+        WRITER.ring_size = ring_size
+
 
 class Logger:
-    """The Logger"""
+    """The Logger
 
-    def __init__(self, name, debug=False, use_syslog=True, log_file="/var/log/raspi-project.log"):
+    The records are written by the shared `WRITER` in a background thread, so logging does not block the caller.
+    """
+
+    def __init__(self, name, debug=False, use_syslog=True, log_file=DEFAULT_LOG_FILE):
         """Constructor
 
         :param name: label or name of the module
         :param debug: whether debug messages should be shown
         :param use_syslog: whether to log into syslog
-        :param log_file: file to log to, if `None` no log file is used
+        :param log_file: file to log to, if `None` no log file is used, by default `LOG_FILE` (see `configure`)
         """
         self.name = name
         self.isDebugging = debug
@@ -27,42 +47,41 @@ class Logger:
         if self.use_syslog:
             syslog.openlog(self.name + " ", logoption=syslog.LOG_PID, facility=syslog.LOG_LOCAL7)
 
-        if self.log_file is not None and os.path.exists(self.log_file):
-            try:
-                os.remove(self.log_file)
-            except OSError:
-                traceback.print_exc()
-        
-    def debug(self, message):
-        """Debug log"""
+    def debug(self, message, *args):
+        """Debug log
+
+        The message is formatted only when debugging, so on hot paths pass the `%` format arguments separately, e.g.
+        `logger.debug("Bit %s: %s", bit, value)`, or a callable returning the message, e.g.
+        `logger.debug(lambda: "Output: " + "0b{:08b}".format(output))`.
+        """
         if self.isDebugging:
-            self.__log__(syslog.LOG_DEBUG, "DEBUG", message)
+            self.__log__(syslog.LOG_DEBUG, "DEBUG", message, args)
 
-    def info(self, message):
+    def info(self, message, *args):
         """Info log"""
-        self.__log__(syslog.LOG_INFO, "INFO", message)
+        self.__log__(syslog.LOG_INFO, "INFO", message, args)
 
-    def warn(self, message):
+    def warn(self, message, *args):
         """Warning log"""
-        self.__log__(syslog.LOG_WARNING, "WARN", message)
+        self.__log__(syslog.LOG_WARNING, "WARN", message, args)
 
-    def error(self, message):
+    def error(self, message, *args):
         """Error log"""
-        self.__log__(syslog.LOG_ERR, "ERROR", message)
+        self.__log__(syslog.LOG_ERR, "ERROR", message, args)
 
-    def exception(self, message):
+    def exception(self, message, *args):
         """Exception log"""
+        message = self.__format(message, args)
         self.__log__(syslog.LOG_CRIT, "CRITICAL", message)
+        WRITER.flush()
         raise Exception(message)
 
-    def __log__(self, priority, priority_text, message):
-        full_message = time.ctime() + " " + priority_text.ljust(8) + "[" + self.name.ljust(18) + "]: " + message
-        print(full_message)
-        if self.use_syslog and priority <= syslog.LOG_INFO:
-            syslog.syslog(priority, message)
-        if self.log_file is not None:
-            try:
-                with open(self.log_file, "a") as fp:
-                    fp.write(full_message + "\n")
-            except:
-                traceback.print_exc()
+    def __log__(self, priority, priority_text, message, args=()):
+        WRITER.write((time.time(), priority, priority_text, self.name, self.__format(message, args), self.use_syslog,
+                      LOG_FILE if self.log_file == DEFAULT_LOG_FILE else self.log_file))
+
+    @staticmethod
+    def __format(message, args):
+        if callable(message):
+            message = message()
+        return message % args if len(args) > 0 else message
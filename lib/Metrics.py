@@ -0,0 +1,74 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import bisect
+import threading
+
+BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0]
+
+
+class Metrics(object):
+    """In-process latency histograms of the modules' hot paths
+
+    A histogram is kept per `(module, kind, handler)` key, e.g. `("ws281x", "looper", "looper")` or
+    `("state-machine", "listener", "on_mcp23017_change")`. Observing a duration costs a bisect and a few additions, so
+    the modules can be instrumented without depending on `prometheus_client`, the `Prometheus` module exports the
+    histograms when enabled.
+
+    Loopers register themselves to have their thread statistics (see `ModuleLooper.stats`) reported as well.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = BUCKETS if buckets is None else buckets
+        self.__histograms = {}
+        self.__loopers = []
+        self.__lock = threading.Lock()
+
+    def register(self, looper):
+        with self.__lock:
+            if looper not in self.__loopers:
+                self.__loopers.append(looper)
+
+    def looper_stats(self):
+        """Dictionary of the registered loopers' statistics by module ID"""
+        with self.__lock:
+            loopers = list(self.__loopers)
+        return dict((looper.module_id, looper.stats()) for looper in loopers)
+
+    def observe(self, module, kind, handler, seconds):
+        """Records a call of the `handler` of the `module` taking `seconds`."""
+        key = (module, kind, handler)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.__lock:
+            histogram = self.__histograms.get(key, None)
+            if histogram is None:
+                histogram = [[0] * (len(self.buckets) + 1), 0.0]
+                self.__histograms[key] = histogram
+            histogram[0][index] = histogram[0][index] + 1
+            histogram[1] = histogram[1] + seconds
+
+    def histograms(self):
+        """List of `(module, kind, handler, cumulative bucket counts, count, sum)` tuples.
+
+        The cumulative counts correspond to the `buckets` upper bounds followed by `+Inf`.
+        """
+        with self.__lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in self.__histograms.items()]
+        result = []
+        for (module, kind, handler), counts, total in sorted(snapshot):
+            cumulative = []
+            count = 0
+            for bucket_count in counts:
+                count = count + bucket_count
+                cumulative.append(count)
+            result.append((module, kind, handler, cumulative, count, total))
+        return result
+
+    def clear(self):
+        with self.__lock:
+            self.__histograms = {}
+
+
+METRICS = Metrics()
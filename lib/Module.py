@@ -3,17 +3,27 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
+from lib.EventBus import BUS
 from lib.Logger import Logger
+from lib.Util import to_snake_case
 
 
 class Module(object):
-    """Top module abstraction"""
+    """Top module abstraction
+
+    A module declares the modules it depends on by `module_*` properties (e.g. `module_mqtt = None`) and the events it
+    notifies its listeners of in `events` (e.g. `['on_rgb_change']`).
+    """
 
     finalizing = False
-    listeners = []
+    events = []
 
     def __init__(self, **kwargs):
         self.logger = Logger(type(self).__name__, kwargs['debug'] if 'debug' in kwargs.keys() else False)
+        self.module_id = to_snake_case(type(self).__name__, "-")
+        self.listeners = []
+        self.__registered = set()
+        self.__events = set(self.events)
 
     def initialize(self):
         self.logger.debug("Initializing...")
@@ -21,8 +31,28 @@ class Module(object):
     def register(self, listener):
         """Register a listener."""
         self.logger.debug("Registring: " + str(listener))
-        if listener not in self.listeners:
+        if listener not in self.__registered:
+            self.__registered.add(listener)
             self.listeners.append(listener)
+            for event in self.__events:
+                self.__subscribe(listener, event)
+
+    def notify_listeners(self, event, *args):
+        """Calls the `event` method, e.g. `on_rgb_change`, of all listeners implementing it with the `args`.
+
+        The event is published on the `lib.EventBus`, which records the duration of each call in the listener's
+        `listener` histogram.
+        """
+        if event not in self.__events:  # Not declared in `events`
+            self.__events.add(event)
+            for listener in self.listeners:
+                self.__subscribe(listener, event)
+        BUS.publish(self, event, *args)
+
+    def __subscribe(self, listener, event):
+        callback = getattr(listener, event, None)
+        if callback is not None:
+            BUS.subscribe(self, event, callback, getattr(listener, 'module_id', type(listener).__name__))
 
     def start(self):
         """Module's start trigger.
@@ -59,5 +89,7 @@ class Module(object):
     def finalize(self):
         """Final cleanup before unloading the module."""
         self.logger.debug("Finalizing...")
+        BUS.unsubscribe(self)
         self.listeners = []
+        self.__registered = set()
         self.finalizing = True
@@ -8,21 +8,34 @@ import threading
 import time
 import traceback
 
+from lib.Metrics import METRICS
 from lib.Module import Module
-from lib.Util import to_snake_case
+from lib.Util import gettid, monotonic, thread_cpu_time, to_snake_case
 
 
 class ModuleLooper(Module):
-    """Looper module providing a simple thread management"""
+    """Looper module providing a simple thread management
+
+    By default every looper runs in its own thread. With a `runtime` set (see `lib.AsyncRuntime`) the loopers are run
+    by the runtime instead, a looper may then implement a non-blocking `looper_async()` as well.
+    """
+
+    runtime = None
 
     __interrupted = False
     __thread = None
+    __thread_id = None
+    __cpu_time = 0.0
+
+    iterations = 0
+    exceptions = 0
 
     module_mqtt = None
 
     def __init__(self, **kwargs):
         super(ModuleLooper, self).__init__(**kwargs)
         self.thread_name = to_snake_case(type(self).__name__, " ", None)
+        METRICS.register(self)
 
     def start(self):
         """Starts the looper.
@@ -40,9 +53,12 @@ class ModuleLooper(Module):
             if self.module_mqtt is not None:
                 self.module_mqtt.publish("state", "ON", module=self)
             self.__interrupted = False
-            self.__thread = threading.Thread(target=self.__looper__)
-            self.__thread.daemon = True
-            self.__thread.start()
+            if self.runtime is not None:
+                self.__thread = self.runtime.start(self)
+            else:
+                self.__thread = threading.Thread(target=self.__looper__)
+                self.__thread.daemon = True
+                self.__thread.start()
         return self.__thread
 
     def stop(self):
@@ -78,6 +94,22 @@ class ModuleLooper(Module):
         """Checks if looper is still running"""
         return self.__thread is not None
 
+    def stats(self):
+        """Looper thread statistics: `iterations`, `exceptions` swallowed by the looper and consumed `cpu` seconds
+
+        Run by a `runtime`, the `cpu` seconds count only the time in the runtime's thread pool.
+        """
+        cpu_time = self.__cpu_time
+        thread_id = self.__thread_id
+        if thread_id is not None:
+            cpu_time = cpu_time + (thread_cpu_time(thread_id) or 0.0)
+        return {
+            'running': self.is_running(),
+            'iterations': self.iterations,
+            'exceptions': self.exceptions,
+            'cpu': round(cpu_time, 2)
+        }
+
     def looper(self):
         """Looper method to be overwritten by modules.
 
@@ -89,11 +121,33 @@ class ModuleLooper(Module):
 
     def __looper__(self):
         prctl.set_name(self.thread_name)
+        self.__thread_id = gettid()
         while not self.__interrupted:
+            start = monotonic()
             try:
                 self.looper()
             except:
-                self.logger.error("Unexpected Error!")
-                traceback.print_exc()
+                self._looper_failed()
+            self._looper_done(start)
+        self.__cpu_time = self.__cpu_time + (thread_cpu_time(self.__thread_id) or 0.0)
+        self.__thread_id = None
+        self._looper_exited()
+
+    def _looper_failed(self):
+        """Handles the exception raised by the current iteration (called in the `except` block)"""
+        self.exceptions = self.exceptions + 1
+        self.logger.error("Unexpected Error!")
+        traceback.print_exc()
+
+    def _looper_done(self, start):
+        """Accounts an iteration started at `start`"""
+        self.iterations = self.iterations + 1
+        METRICS.observe(self.module_id, "looper", "looper", monotonic() - start)
+
+    def _looper_cpu(self, seconds):
+        """Accounts `seconds` of CPU time consumed by the looper outside of its own thread"""
+        self.__cpu_time = self.__cpu_time + seconds
+
+    def _looper_exited(self):
         self.__thread = None
         self.logger.info("Exiting looper")
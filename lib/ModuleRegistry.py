@@ -0,0 +1,79 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import os
+
+from lib.Logger import Logger
+from lib.Util import to_snake_case
+
+
+class ModuleRegistry(object):
+    """Modules available in the `modules` package
+
+    The directory is scanned once and the module names are resolved by their module IDs (e.g. `ir-sensor`) and by
+    their dependency properties (e.g. `module_ir_sensor`) from dictionaries. A module is imported on first use only and
+    the dependencies it declares by its `module_*` properties are collected once per module.
+    """
+
+    def __init__(self, directory='modules', package='modules'):
+        self.package = package
+        self.__names = sorted([module_file[:-3] for module_file in os.listdir(directory)
+                               if module_file.endswith(".py") and module_file != "__init__.py"])
+        self.__ids = dict((to_snake_case(name, "-"), name) for name in self.__names)
+        self.__properties = dict(("module_" + to_snake_case(name), name) for name in self.__names)
+        self.__classes = {}
+        self.__requirements = {}
+        self.logger = Logger(type(self).__name__)
+
+    def names(self):
+        """Names of all available modules in alphabetical order"""
+        return list(self.__names)
+
+    def name(self, module_id):
+        """Name of the module with the `module_id` or `None`"""
+        return self.__ids.get(module_id, None)
+
+    def property(self, name):
+        """Property the module `name` is injected to, e.g. `module_ir_sensor`"""
+        return "module_" + to_snake_case(name)
+
+    def load(self, name):
+        """Imports the module `name` (if not imported yet) and returns its class."""
+        clazz = self.__classes.get(name, None)
+        if clazz is None:
+            module = __import__(self.package + "." + name, fromlist=[name])
+            clazz = getattr(module, name)
+            self.__classes[name] = clazz
+        return clazz
+
+    def dependencies(self, name, available):
+        """Names of the `available` modules the module `name` has a `module_*` property for, in the given order"""
+        wanted = self.__requirements.get(name, None)
+        if wanted is None:
+            clazz = self.load(name)
+            wanted = set(self.__properties[attribute] for attribute in dir(clazz) if attribute in self.__properties)
+            self.__requirements[name] = wanted
+        return [dependency for dependency in available if dependency != name and dependency in wanted]
+
+    def resolve(self, names):
+        """Resolves the dependency graph of the modules `names`.
+
+        :return: `(dependencies, stages)`, the loaded dependencies of every module and the modules split in stages, a
+                 module depending only on modules of the previous stages. Modules depending on each other (directly or
+                 indirectly) are put in the last stage together.
+        """
+        dependencies = dict((name, self.dependencies(name, names)) for name in names)
+        stages = []
+        resolved = set()
+        pending = list(names)
+        while len(pending) > 0:
+            stage = [name for name in pending if resolved.issuperset(dependencies[name])]
+            if len(stage) == 0:
+                self.logger.warn("Cyclic dependencies among: %s", ", ".join(pending))
+                stage = pending
+            stages.append(stage)
+            resolved.update(stage)
+            pending = [name for name in pending if name not in resolved]
+        return dependencies, stages
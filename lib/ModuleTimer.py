@@ -4,9 +4,9 @@
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
 import traceback
-from threading import Timer
 
 from lib.Module import Module
+from lib.Scheduler import SCHEDULER
 
 
 class ModuleTimer(Module):
@@ -42,7 +42,6 @@ class ModuleTimer(Module):
     def __trigger__(self):
         try:
             self.trigger()
-            self.timer = Timer(self.delay, self.__trigger__).start()
         except:
             self.logger.error("Unexpected Error!")
             traceback.print_exc()
@@ -52,12 +51,15 @@ class ModuleTimer(Module):
 
     def start_timer(self, delay):
         super(ModuleTimer, self).on_start()
-        if delay > 0 and self.timer is None:
+        if delay > 0:
             self.delay = delay
-            self.on_start()
-            if self.module_mqtt is not None:
-                self.module_mqtt.publish("state", "ON", module=self)
-            self.timer = Timer(self.delay, self.__trigger__).start()
+            if self.timer is None:
+                self.on_start()
+                if self.module_mqtt is not None:
+                    self.module_mqtt.publish("state", "ON", module=self)
+            else:  # Restarts with the new delay
+                self.timer.cancel()
+            self.timer = SCHEDULER.every(self.delay, self.__trigger__)
 
     def stop(self):
         super(ModuleTimer, self).on_stop()
@@ -1,7 +1,7 @@
 #!/usr/bin/python2
 import time
 import math
-import smbus
+from lib.I2CBus import I2C_BUS
 from lib.Logger import Logger
 
 # ============================================================================
@@ -29,7 +29,7 @@ class PCA9685:
     freq = 50
 
     def __init__(self, address=0x40, debug=False):
-        self.bus = smbus.SMBus(1)
+        self.bus = I2C_BUS
         self.address = address
         self.logger = Logger("PCA9658", debug)
         self.logger.debug("Reseting PCA9685")
@@ -38,12 +38,12 @@ class PCA9685:
     def write(self, reg, value):
         """"Writes an 8-bit value to the specified register/address"""
         self.bus.write_byte_data(self.address, reg, value)
-        self.logger.debug("I2C: Write 0x%02X to register 0x%02X" % (value, reg))
+        self.logger.debug("I2C: Write 0x%02X to register 0x%02X", value, reg)
 
     def read(self, reg):
         """Read an unsigned byte from the I2C device"""
         result = self.bus.read_byte_data(self.address, reg)
-        self.logger.debug("I2C: Device 0x%02X returned 0x%02X from reg 0x%02X" % (self.address, result & 0xFF, reg))
+        self.logger.debug("I2C: Device 0x%02X returned 0x%02X from reg 0x%02X", self.address, result & 0xFF, reg)
         return result
 
     def setPWMFreq(self, freq):
@@ -53,10 +53,10 @@ class PCA9685:
         prescaleval /= 4096.0       # 12-bit
         prescaleval /= float(freq)
         prescaleval -= 1.0
-        self.logger.debug("Setting PWM frequency to %d Hz" % freq)
-        self.logger.debug("Estimated pre-scale: %d" % prescaleval)
+        self.logger.debug("Setting PWM frequency to %d Hz", freq)
+        self.logger.debug("Estimated pre-scale: %d", prescaleval)
         prescale = math.floor(prescaleval + 0.5)
-        self.logger.debug("Final pre-scale: %d" % prescale)
+        self.logger.debug("Final pre-scale: %d", prescale)
 
         oldmode = self.read(self.__MODE1)
         newmode = (oldmode & 0x7F) | 0x10        # sleep
@@ -68,11 +68,11 @@ class PCA9685:
 
     def setPWM(self, channel, on, off):
         """Sets a single PWM channel"""
-        self.write(self.__LED0_ON_L+4*channel, int(on) & 0xFF)
-        self.write(self.__LED0_ON_H+4*channel, int(on) >> 8)
-        self.write(self.__LED0_OFF_L+4*channel, int(off) & 0xFF)
-        self.write(self.__LED0_OFF_H+4*channel, int(off) >> 8)
-        self.logger.debug("channel: %d  LED_ON: %d LED_OFF: %d" % (channel, on, off))
+        self.bus.batch(self.address, [('write_byte_data', self.__LED0_ON_L+4*channel, int(on) & 0xFF),
+                                      ('write_byte_data', self.__LED0_ON_H+4*channel, int(on) >> 8),
+                                      ('write_byte_data', self.__LED0_OFF_L+4*channel, int(off) & 0xFF),
+                                      ('write_byte_data', self.__LED0_OFF_H+4*channel, int(off) >> 8)])
+        self.logger.debug("channel: %d  LED_ON: %d LED_OFF: %d", channel, on, off)
 
     def setServoPulse(self, channel, pulse):
         """Sets the Servo Pulse,The PWM frequency must be 50HZ"""
@@ -0,0 +1,152 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import heapq
+import threading
+import traceback
+
+try:
+    from Queue import Queue
+except ImportError:  # Python 3
+    from queue import Queue
+
+from lib.Logger import Logger
+from lib.Util import monotonic
+
+
+class ScheduledTask(object):
+    """Handle of a task scheduled by the `Scheduler`"""
+
+    def __init__(self, function, args, kwargs, interval=None):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancels the task if it did not run yet, a periodic task will not be run again."""
+        self.cancelled = True
+
+
+class Scheduler(object):
+    """Runs delayed and periodic tasks
+
+    Replaces a `threading.Timer` thread per timeout: the tasks are kept in a heap ordered by their deadlines on a
+    monotonic clock, one thread waits for the earliest deadline and hands the due tasks to a bounded pool of worker
+    threads. A task running long blocks its worker, so the shared `SCHEDULER` is meant for short callbacks (e.g.
+    the safety timeout of the wheels) and blocking work (e.g. a sensor read) is run on a scheduler of its own.
+    """
+
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.logger = Logger(type(self).__name__)
+        self.__heap = []
+        self.__sequence = 0
+        self.__queue = Queue()
+        self.__condition = threading.Condition()
+        self.__threads = []
+        self.__shutdown = False
+
+    def schedule(self, delay, function, *args, **kwargs):
+        """Runs `function(*args, **kwargs)` once after `delay` seconds.
+
+        :return: the `ScheduledTask` handle to cancel the task with
+        """
+        task = ScheduledTask(function, args, kwargs)
+        self.__push(monotonic() + delay, task)
+        return task
+
+    def every(self, interval, function, *args, **kwargs):
+        """Runs `function(*args, **kwargs)` every `interval` seconds, counted from the end of the previous run.
+
+        :return: the `ScheduledTask` handle to cancel the task with
+        """
+        task = ScheduledTask(function, args, kwargs, interval)
+        self.__push(monotonic() + interval, task)
+        return task
+
+    def submit(self, function, *args, **kwargs):
+        """Runs `function(*args, **kwargs)` as soon as a worker is free.
+
+        :return: the `ScheduledTask` handle to cancel the task with
+        """
+        task = ScheduledTask(function, args, kwargs)
+        with self.__condition:
+            if self.__shutdown:
+                task.cancel()
+                return task
+            if len(self.__threads) == 0:
+                self.__start()
+        self.__queue.put(task)
+        return task
+
+    def pending(self):
+        """Number of tasks waiting for their deadline"""
+        with self.__condition:
+            return len([entry for entry in self.__heap if not entry[2].cancelled])
+
+    def shutdown(self):
+        """Cancels all tasks and stops the threads."""
+        with self.__condition:
+            self.__shutdown = True
+            for deadline, sequence, task in self.__heap:
+                task.cancel()
+            self.__heap = []
+            self.__condition.notify()
+        for _ in self.__threads:
+            self.__queue.put(None)
+
+    def __push(self, deadline, task):
+        with self.__condition:
+            if self.__shutdown:
+                task.cancel()
+                return
+            if len(self.__threads) == 0:
+                self.__start()
+            self.__sequence = self.__sequence + 1
+            heapq.heappush(self.__heap, (deadline, self.__sequence, task))
+            if self.__heap[0][2] is task:
+                self.__condition.notify()
+
+    def __start(self):
+        self.__threads.append(self.__thread(self.__dispatch, "Scheduler"))
+        for index in range(self.workers):
+            self.__threads.append(self.__thread(self.__work, "Scheduler " + str(index + 1)))
+
+    @staticmethod
+    def __thread(target, name):
+        thread = threading.Thread(target=target, name=name)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def __dispatch(self):
+        with self.__condition:
+            while not self.__shutdown:
+                now = monotonic()
+                while len(self.__heap) > 0 and (self.__heap[0][0] <= now or self.__heap[0][2].cancelled):
+                    deadline, sequence, task = heapq.heappop(self.__heap)
+                    if not task.cancelled:
+                        self.__queue.put(task)
+                self.__condition.wait(self.__heap[0][0] - now if len(self.__heap) > 0 else None)
+
+    def __work(self):
+        while True:
+            task = self.__queue.get()
+            if task is None:
+                break
+            if task.cancelled:
+                continue
+            try:
+                task.function(*task.args, **task.kwargs)
+            except:
+                self.logger.error("Unexpected Error!")
+                traceback.print_exc()
+            if task.interval is not None and not task.cancelled:
+                self.__push(monotonic() + task.interval, task)
+
+
+SCHEDULER = Scheduler()
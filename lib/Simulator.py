@@ -0,0 +1,321 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import sys
+import types
+from time import sleep as _sleep  # bound at import so benchmarks can replace `time.sleep` without losing latency
+
+I2C_BAUDRATE = 100000  # Standard mode I2C (100 kHz)
+I2C_BYTE_TIME = 9.0 / I2C_BAUDRATE  # 8 data bits + ACK
+I2C_FRAME_TIME = 2.0 / I2C_BAUDRATE  # START + STOP condition
+WS281X_RESET_TIME = 0.00005  # 50us latch after the last bit
+DHT11_READ_TIME = 0.023  # 18ms start signal + ~5ms of data
+
+latency = True
+
+
+def _delay(seconds):
+    if latency:
+        _sleep(seconds)
+
+
+class GPIOBoard(object):
+    """Simulated `RPi.GPIO` pin header"""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        self.callbacks = {}
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=LOW):
+        pins = pin if isinstance(pin, (list, tuple)) else [pin]
+        for p in pins:
+            self.directions[p] = direction
+            self.levels[p] = self.HIGH if direction == self.IN and pull_up_down == self.PUD_UP else initial
+
+    def output(self, pin, value):
+        pins = pin if isinstance(pin, (list, tuple)) else [pin]
+        for p in pins:
+            self.levels[p] = self.HIGH if value else self.LOW
+
+    def input(self, pin):
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self, pin=None):
+        if pin is None:
+            self.__init__()
+        else:
+            self.directions.pop(pin, None)
+            self.levels.pop(pin, None)
+            self.callbacks.pop(pin, None)
+
+    def trigger(self, pin, value):
+        """Simulates an external level change on an input `pin` firing the registered edge callbacks."""
+        previous = self.levels.get(pin, self.LOW)
+        self.levels[pin] = self.HIGH if value else self.LOW
+        edge, callback = self.callbacks.get(pin, (None, None))
+        if callback is not None and previous != self.levels[pin]:
+            rising = self.levels[pin] == self.HIGH
+            if edge == self.BOTH or (edge == self.RISING and rising) or (edge == self.FALLING and not rising):
+                callback(pin)
+
+    def PWM(self, pin, frequency):
+        return PWM(pin, frequency)
+
+
+class PWM(object):
+    """Simulated `RPi.GPIO.PWM` channel"""
+
+    def __init__(self, pin, frequency):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.running = True
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+
+
+class SMBus(object):
+    """Simulated `smbus.SMBus` with a register map per device and I2C wire time latency
+
+    All instances opened on the same port share the register maps, the same way all handles share one physical bus.
+    """
+
+    registers = {}
+
+    def __init__(self, port=1):
+        self.port = port
+        self.transactions = 0
+        self.bytes = 0
+
+    def __device(self, addr):
+        return self.registers.setdefault((self.port, addr), {})
+
+    def __transfer(self, count, repeated_start=False):
+        """Accounts a transfer of `count` bytes (including the address byte)."""
+        self.transactions = self.transactions + 1
+        self.bytes = self.bytes + count
+        _delay(I2C_FRAME_TIME * (2 if repeated_start else 1) + I2C_BYTE_TIME * count)
+
+    def write_quick(self, addr):
+        self.__transfer(1)
+
+    def write_byte(self, addr, value):
+        self.__device(addr)[None] = value & 0xFF
+        self.__transfer(2)
+
+    def read_byte(self, addr):
+        self.__transfer(2)
+        return self.__device(addr).get(None, 0)
+
+    def write_byte_data(self, addr, cmd, value):
+        self.__device(addr)[cmd] = value & 0xFF
+        self.__transfer(3)
+
+    def read_byte_data(self, addr, cmd):
+        self.__transfer(4, True)
+        return self.__device(addr).get(cmd, 0)
+
+    def write_word_data(self, addr, cmd, value):
+        device = self.__device(addr)
+        device[cmd] = value & 0xFF
+        device[cmd + 1] = (value >> 8) & 0xFF
+        self.__transfer(4)
+
+    def read_word_data(self, addr, cmd):
+        self.__transfer(5, True)
+        device = self.__device(addr)
+        return device.get(cmd, 0) | (device.get(cmd + 1, 0) << 8)
+
+    def write_block_data(self, addr, cmd, values):
+        self.__write_block(addr, cmd, values)
+        self.__transfer(4 + len(values))
+
+    def write_i2c_block_data(self, addr, cmd, values):
+        self.__write_block(addr, cmd, values)
+        self.__transfer(3 + len(values))
+
+    def read_block_data(self, addr, cmd):
+        device = self.__device(addr)
+        values = [device.get(cmd + i, 0) for i in range(device.get(('length', cmd), 0))]
+        self.__transfer(5 + len(values), True)
+        return values
+
+    def read_i2c_block_data(self, addr, cmd, length=32):
+        device = self.__device(addr)
+        self.__transfer(3 + length, True)
+        return [device.get(cmd + i, 0) for i in range(length)]
+
+    def close(self):
+        pass
+
+    def __write_block(self, addr, cmd, values):
+        device = self.__device(addr)
+        device[('length', cmd)] = len(values)
+        for i, value in enumerate(values):
+            device[cmd + i] = value & 0xFF
+
+
+class LEDData(object):
+    """Simulated LED buffer supporting the same slice assignment as the `rpi_ws281x` one"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0] * size
+
+    def __getitem__(self, pos):
+        return self.values[pos]
+
+    def __setitem__(self, pos, value):
+        if isinstance(pos, slice):
+            for index, n in enumerate(range(*pos.indices(self.size))):
+                self.values[n] = int(value[index])
+        else:
+            self.values[pos] = int(value)
+
+    def __len__(self):
+        return self.size
+
+
+class Adafruit_NeoPixel(object):
+    """Simulated `neopixel.Adafruit_NeoPixel` strip with the wire time of a WS281x transfer"""
+
+    def __init__(self, num, pin, freq_hz=800000, dma=10, invert=False, brightness=255, channel=0, strip_type=None):
+        self.num = num
+        self.pin = pin
+        self.freq_hz = freq_hz
+        self.brightness = brightness
+        self.shows = 0
+        self._led_data = LEDData(num)
+
+    def begin(self):
+        pass
+
+    def show(self):
+        self.shows = self.shows + 1
+        _delay(24.0 * self.num / self.freq_hz + WS281X_RESET_TIME)
+
+    def setPixelColor(self, n, color):
+        self._led_data[n] = color
+
+    def setPixelColorRGB(self, n, red, green, blue, white=0):
+        self.setPixelColor(n, Color(red, green, blue, white))
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+
+    def getBrightness(self):
+        return self.brightness
+
+    def getPixels(self):
+        return self._led_data
+
+    def numPixels(self):
+        return self.num
+
+    def getPixelColor(self, n):
+        return self._led_data[n]
+
+
+def Color(red, green, blue, white=0):
+    """Same 24-bit color packing as `neopixel.Color`."""
+    return (white << 24) | (red << 16) | (green << 8) | blue
+
+
+class PiGPIO(object):
+    """Simulated `pigpio.pi` connection"""
+
+    def __init__(self, host=None, port=None):
+        self.connected = True
+        self.duty_cycles = {}
+
+    def set_PWM_dutycycle(self, pin, duty_cycle):
+        self.duty_cycles[pin] = duty_cycle
+
+    def get_PWM_dutycycle(self, pin):
+        return self.duty_cycles.get(pin, 0)
+
+    def stop(self):
+        self.connected = False
+
+
+class DHT(object):
+    """Simulated `Adafruit_DHT` sensor reading"""
+
+    humidity = 45.0
+    temperature = 21.0
+
+    @classmethod
+    def read_retry(cls, sensor, pin, retries=15, delay_seconds=2):
+        _delay(DHT11_READ_TIME)
+        return cls.humidity, cls.temperature
+
+
+gpio = GPIOBoard()
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install(with_latency=True):
+    """Installs the simulators in place of the hardware libraries.
+
+    Needs to be called before any module depending on `RPi.GPIO`, `smbus`, `neopixel`, `pigpio` or `Adafruit_DHT` is
+    imported.
+
+    :param with_latency: whether to simulate the time the real hardware takes (I2C byte time, WS281x wire time, ...)
+    """
+    global latency
+    latency = with_latency
+
+    gpio_attributes = dict((name, getattr(gpio, name)) for name in dir(gpio) if not name.startswith('_'))
+    _module('RPi', GPIO=_module('RPi.GPIO', **gpio_attributes))
+    _module('smbus', SMBus=SMBus)
+    _module('neopixel', Adafruit_NeoPixel=Adafruit_NeoPixel, Color=Color, ws=_module('_rpi_ws281x',
+            WS2811_STRIP_RGB=0x00100800, WS2811_STRIP_RBG=0x00100008, WS2811_STRIP_GRB=0x00081000,
+            WS2811_STRIP_GBR=0x00080010, WS2811_STRIP_BRG=0x00001008, WS2811_STRIP_BGR=0x00000810))
+    _module('pigpio', pi=PiGPIO)
+    _module('Adafruit_DHT', read_retry=DHT.read_retry, DHT11=11, DHT22=22)
@@ -0,0 +1,109 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+import json
+import sys
+import threading
+
+try:
+    import __builtin__ as builtins
+except ImportError:  # Python 3
+    import builtins
+
+from lib.Util import monotonic, process_age
+
+
+class StartupProfiler(object):
+    """Measures where the time until all modules are started goes
+
+    While installed, `__import__` is wrapped to time every import loading new modules (e.g. `paho.mqtt.client`,
+    `yaml`, `jinja2`, `prometheus_client`, `neopixel` imported by the modules). The cumulative time of an import
+    includes the imports it triggers, its self time does not. The imports are timed per thread, as the modules are
+    instantiated concurrently.
+    """
+
+    def __init__(self):
+        self.started = None
+        self.process_age = None
+        self.__original = None
+        self.__imports = {}
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+
+    def install(self):
+        """Starts timing the imports."""
+        if self.__original is None:
+            self.started = monotonic()
+            self.process_age = process_age()
+            self.__original = builtins.__import__
+            builtins.__import__ = self.__import
+
+    def uninstall(self):
+        """Stops timing the imports."""
+        if self.__original is not None:
+            builtins.__import__ = self.__original
+            self.__original = None
+
+    def imports(self):
+        """List of `(name, cumulative seconds, self seconds)` of the timed imports, the slowest first"""
+        with self.__lock:
+            imports = [(name, cumulative, own) for name, (cumulative, own) in self.__imports.items()]
+        return sorted(imports, key=lambda entry: entry[1], reverse=True)
+
+    def report(self, modules):
+        """Breakdown of the startup time
+
+        :param modules: dictionary of the phases' (e.g. `construct`) seconds by module name
+        """
+        elapsed = monotonic() - self.started
+        return {
+            'total': elapsed + (self.process_age or 0.0),
+            'before_profiling': self.process_age,
+            'profiled': elapsed,
+            'imports': [{'name': name, 'cumulative': cumulative, 'self': own}
+                        for name, cumulative, own in self.imports()],
+            'modules': dict((name, dict(phases)) for name, phases in modules.items())
+        }
+
+    def write(self, file_name, modules):
+        """Writes the `report` as JSON to `file_name`."""
+        with open(file_name, "w") as fp:
+            json.dump(self.report(modules), fp, indent=2, sort_keys=True)
+
+    def __import(self, name, *args, **kwargs):
+        stack = getattr(self.__local, 'stack', None)
+        if stack is None:
+            stack = []
+            self.__local.stack = stack
+        absolute = self.__absolute(name, *args, **kwargs)
+        fromlist = kwargs.get('fromlist', args[2] if len(args) > 2 else None) or ()
+        missing = [module for module in [absolute] + [absolute + "." + item for item in fromlist if item != "*"]
+                   if module not in sys.modules]  # Decided per name, other threads may be importing meanwhile
+        stack.append(0.0)  # Cumulative time of the nested imports
+        start = monotonic()
+        try:
+            return self.__original(name, *args, **kwargs)
+        finally:
+            cumulative = monotonic() - start
+            nested = stack.pop()
+            if len(stack) > 0:
+                stack[-1] = stack[-1] + cumulative
+            if any(module in sys.modules for module in missing):  # Loaded by this import
+                with self.__lock:
+                    previous = self.__imports.get(absolute, (0.0, 0.0))
+                    self.__imports[absolute] = (previous[0] + cumulative, previous[1] + cumulative - nested)
+
+    @staticmethod
+    def __absolute(name, globals=None, locals=None, fromlist=None, level=0):
+        """Resolves explicit relative imports (e.g. `from . import x`) to the imported module's absolute name"""
+        if level <= 0 or globals is None:
+            return name
+        package = globals.get('__package__', None)
+        if not package:
+            package = globals.get('__name__', '')
+            package = package if '__path__' in globals else package.rpartition('.')[0]
+        if level > 1:
+            package = package.rsplit('.', level - 1)[0]
+        return package + "." + name if name else package
@@ -0,0 +1,54 @@
+#!/usr/bin/python2
+# -*- coding:utf-8 -*-
+#
+# Author: Jan Kubovy (jan@kubovy.eu)
+#
+
+
+class TopicTrie(object):
+    """Routes MQTT topics to handlers subscribed with topic filters
+
+    Topic filters may contain the MQTT wildcards: `+` matching exactly one level and `#` (last level only) matching any
+    number of levels including the parent level, e.g. `a/#` matches `a`, `a/b` and `a/b/c`. Matching is done level by
+    level, so it takes time proportional to the topic's depth and not to the number of subscriptions. Handlers are
+    returned in the order they were subscribed in.
+    """
+
+    def __init__(self):
+        self.__root = {}
+        self.__sequence = 0
+
+    def add(self, topic_filter, handler):
+        node = self.__root
+        for level in topic_filter.split("/"):
+            node = node.setdefault(level, {})
+        self.__sequence = self.__sequence + 1
+        node.setdefault(None, []).append((self.__sequence, handler))
+
+    def remove(self, topic_filter, handler):
+        node = self.__root
+        for level in topic_filter.split("/"):
+            node = node.get(level, None)
+            if node is None:
+                return
+        node[None] = [(sequence, h) for sequence, h in node.get(None, []) if h != handler]
+
+    def clear(self):
+        self.__root = {}
+
+    def match(self, topic):
+        """Handlers subscribed to filters matching the `topic`"""
+        found = []
+        self.__match(self.__root, topic.split("/"), 0, found)
+        return [handler for sequence, handler in sorted(found, key=lambda item: item[0])]
+
+    def __match(self, node, levels, depth, found):
+        if "#" in node:
+            found.extend(node["#"].get(None, []))
+        if depth == len(levels):
+            found.extend(node.get(None, []))
+            return
+        if levels[depth] in node:
+            self.__match(node[levels[depth]], levels, depth + 1, found)
+        if "+" in node:
+            self.__match(node["+"], levels, depth + 1, found)
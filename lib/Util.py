@@ -1,4 +1,64 @@
+import os
+import platform
 import re
+import time
+
+try:
+    from time import monotonic
+except ImportError:  # Python 2
+    import ctypes
+    import ctypes.util
+
+    class _Timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    try:
+        # No argtypes, converting the arguments would double the cost of the call
+        _clock_gettime = ctypes.CDLL(ctypes.util.find_library('rt') or 'librt.so.1', use_errno=True).clock_gettime
+    except (OSError, AttributeError):
+        _clock_gettime = None
+    _byref = ctypes.byref
+
+    def monotonic():
+        """Seconds of a clock which cannot go backwards (`CLOCK_MONOTONIC`), falls back to `time.time()`"""
+        if _clock_gettime is None:
+            return time.time()
+        timespec = _Timespec()
+        _clock_gettime(1, _byref(timespec))  # CLOCK_MONOTONIC
+        return timespec.tv_sec + timespec.tv_nsec * 1e-9
+
+
+try:
+    from threading import get_native_id as gettid
+except ImportError:  # Python < 3.8
+    import ctypes
+
+    _SYS_GETTID = {'x86_64': 186, 'aarch64': 178, 'i386': 224, 'i686': 224}.get(platform.machine(), 224)  # 224: ARM
+
+    try:
+        _syscall = ctypes.CDLL(None, use_errno=True).syscall
+    except (OSError, AttributeError):
+        _syscall = None
+
+    def gettid():
+        """Kernel thread ID of the calling thread, falls back to the process ID"""
+        return _syscall(_SYS_GETTID) if _syscall is not None else os.getpid()
+
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def thread_cpu_time(tid):
+    """User and system CPU time in seconds consumed by the thread with the kernel thread ID `tid` (Linux only).
+
+    :return: the time or `None` if the thread does not exist (anymore)
+    """
+    try:
+        with open("/proc/self/task/" + str(tid) + "/stat", "r") as fp:
+            fields = fp.read().rsplit(")", 1)[1].split()  # The thread name in parentheses may contain spaces
+    except (IOError, OSError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / float(_CLOCK_TICKS)  # utime and stime fields 14 and 15
 
 
 def to_snake_case(name, separator="_", case=False):
@@ -16,3 +76,18 @@ def to_snake_case(name, separator="_", case=False):
     elif case is not None and not case:
         result = result.lower()
     return result
+
+
+def process_age():
+    """Seconds since the current process was started (Linux only).
+
+    :return: the time or `None` if it cannot be determined
+    """
+    try:
+        with open("/proc/self/stat", "r") as fp:
+            fields = fp.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as fp:
+            uptime = float(fp.read().split()[0])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return uptime - int(fields[19]) / float(_CLOCK_TICKS)  # starttime field 22
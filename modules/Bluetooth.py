@@ -25,6 +25,8 @@ class Bluetooth(ModuleLooper):
     """Bluetooth server module create two thread each opening one connection, one for inbound and one for outbound
     communication"""
 
+    events = ['on_bluetooth_message']
+
     __buffer_outgoing = []
     __buffer_incoming = ""
     __sockets = []
@@ -91,9 +93,7 @@ class Bluetooth(ModuleLooper):
             elif len(parts) > 0:
                 self.module_mqtt.publish("", parts[0], module=self)
 
-        for listener in self.listeners:
-            if hasattr(listener, 'on_bluetooth_message'):
-                listener.on_bluetooth_message(message)
+        self.notify_listeners('on_bluetooth_message', message)
 
     def __outbound_looper(self, port):
         prctl.set_name(self.thread_name + " Out " + str(port))
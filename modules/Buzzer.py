@@ -3,11 +3,10 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
-from threading import Timer
-
 import RPi.GPIO as GPIO
 
 from lib.Module import Module
+from lib.Scheduler import SCHEDULER
 
 
 class Buzzer(Module):
@@ -26,7 +25,7 @@ class Buzzer(Module):
     def beep(self, delay):
         """Beeps for `delay` seconds"""
         self.on()
-        Timer(delay, self.off).start()
+        SCHEDULER.schedule(delay, self.off)
 
     def on(self):
         """Turns beeper on"""
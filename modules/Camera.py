@@ -14,6 +14,8 @@ from lib.ModuleLooper import ModuleLooper
 class Camera(ModuleLooper):
     """Camera switcher module"""
 
+    events = ['on_camera_switch']
+
     module_mqtt = None
 
     __last_state = None
@@ -32,9 +34,7 @@ class Camera(ModuleLooper):
                 if self.module_mqtt is not None:
                     self.module_mqtt.publish("", "ON" if state else "OFF", module=self)
 
-                for listener in self.listeners:
-                    if hasattr(listener, 'on_camera_switch'):
-                        listener.on_camera_switch(state)
+                self.notify_listeners('on_camera_switch', state)
         except:
             self.logger.error("Unexpected Error!")
             traceback.print_exc()
@@ -45,6 +45,4 @@ class Camera(ModuleLooper):
             call(["/usr/local/bin/mjpeg-streamer", "start"])
         else:
             call(["/usr/local/bin/mjpeg-streamer", "stop"])
-        for listener in self.listeners:
-            if hasattr(listener, 'on_camera_switch'):
-                listener.on_camera_switch(payload == "ON")
+        self.notify_listeners('on_camera_switch', payload == "ON")
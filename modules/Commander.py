@@ -3,12 +3,11 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
-import prctl
 import subprocess
 import traceback
-from threading import *
 
 from lib.Module import Module
+from lib.Scheduler import Scheduler
 
 
 class Check(object):
@@ -18,7 +17,11 @@ class Check(object):
 
 
 class Commander(Module):
-    """Commander module"""
+    """Commander module
+
+    The checks run external commands, so they are run on a scheduler of their own, not blocking the workers of the
+    shared `SCHEDULER` running the short timeouts of the other modules.
+    """
 
     module_mqtt = None
 
@@ -27,6 +30,7 @@ class Commander(Module):
 
     def __init__(self, checks=None, debug=False):
         super(Commander, self).__init__(debug=debug)
+        self.__scheduler = Scheduler(workers=1)
         for check in [] if checks is None else checks:
             self.__enqueue(check)
 
@@ -52,15 +56,12 @@ class Commander(Module):
             self.logger.debug("Timer " + key + " = " + str(self.__timer_map[key]))
             if self.__timer_map[key] is not None:
                 self.__timer_map[key].cancel()
+        self.__scheduler.shutdown()
 
     def __enqueue(self, check):
-        timer = Timer(check.interval, self.__trigger, [check])
-        self.__timer_map[check.command] = timer
-        timer.daemon = True
-        timer.start()
+        self.__timer_map[check.command] = self.__scheduler.schedule(check.interval, self.__trigger, check)
 
     def __trigger(self, check):
-        prctl.set_name(Commander.__name__)
         try:
             result = subprocess.Popen('/usr/local/bin/mqtt-cli ' + check.command,
                                       stdout=subprocess.PIPE,
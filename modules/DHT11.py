@@ -5,14 +5,22 @@
 #
 import time
 import traceback
-from threading import *
 
 import Adafruit_DHT
 
 from lib.Module import Module
+from lib.Scheduler import Scheduler
 
 
 class DHT11(Module):
+    """DHT11 temperature and humidity sensor module
+
+    A read retries for up to 30 seconds, so the sensor is read on a scheduler of its own, not blocking the workers of
+    the shared `SCHEDULER` running the short timeouts of the other modules.
+    """
+
+    events = ['on_temperature_changed', 'on_humidity_changed']
+
     module_mqtt = None
 
     __timer = None
@@ -20,27 +28,27 @@ class DHT11(Module):
     def __init__(self, pin=4, interval=60, debug=False):
         super(DHT11, self).__init__(debug=debug)
         self.__interval = interval
+        self.__scheduler = Scheduler(workers=1)
         self.logger.debug("Pin: " + str(pin) + ", interval: " + str(interval))
         
     def initialize(self):
         super(DHT11, self).initialize()
-        self.__trigger()
+        self.__scheduler.submit(self.__trigger)
 
     def finalize(self):
         super(DHT11, self).finalize()
-        if self.__timer is not None:
-            self.__timer.cancel()
+        self.__scheduler.shutdown()
 
     def on_mqtt_message(self, path, payload):
         if len(path) == 0:
             if payload == "ON":
-                self.__trigger()
+                self.__scheduler.submit(self.__trigger)
             elif self.__timer is not None:
                 self.__timer.cancel()
         if len(path) == 1 and path[0] == "interval":
             try:
                 self.__interval = float(payload)
-                self.__trigger()
+                self.__scheduler.submit(self.__trigger)
             except:
                 self.logger.error("Unexpected Error!")
                 traceback.print_exc()
@@ -51,16 +59,12 @@ class DHT11(Module):
         humidity, temperature = Adafruit_DHT.read_retry(11, 4)
         self.logger.debug("Temperature=" + str(temperature) + ", Humidity=" + str(humidity))
         if self.module_mqtt is not None:
-            self.module_mqtt.publish("humidity", str(humidity), retrain=True, module=self)
-            self.module_mqtt.publish("temperature", str(temperature), retrain=True, module=self)
-            self.module_mqtt.publish("last-update", str(int(round(time.time()))), retrain=True, module=self)
+            self.module_mqtt.publish_state([("humidity", humidity),
+                                            ("temperature", temperature),
+                                            ("last-update", int(round(time.time())))], retrain=True, module=self)
 
-            for listener in self.listeners:
-                if hasattr(listener, 'on_temperature_changed'):
-                    listener.on_temperature_changed(temperature)
-                if hasattr(listener, 'on_humidity_changed'):
-                    listener.on_humidity_changed(humidity)
+            self.notify_listeners('on_temperature_changed', temperature)
+            self.notify_listeners('on_humidity_changed', humidity)
 
         if not self.finalizing:
-            self.__timer = Timer(self.__interval, self.__trigger)
-            self.__timer.start()
+            self.__timer = self.__scheduler.schedule(self.__interval, self.__trigger)
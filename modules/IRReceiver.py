@@ -3,12 +3,12 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
-import threading
 import time
 
 import RPi.GPIO as GPIO
 
 from lib.ModuleLooper import ModuleLooper
+from lib.Scheduler import SCHEDULER
 
 
 class IRReceiver(ModuleLooper):
@@ -259,7 +259,7 @@ class IRReceiver(ModuleLooper):
                     self.perform("TURN_BACK_RIGHT")  # 9
                 elif key == 255:
                     self.perform("REPEAT")  # Repeat
-            self.__timer = threading.Timer(1.0, self.cancel).start()
+            self.__timer = SCHEDULER.schedule(1.0, self.cancel)
 
     def __get_key(self):
         if GPIO.input(self.__pin) == 0:
@@ -5,11 +5,12 @@
 #
 import math
 import re
-from threading import Timer
+import threading
 from time import *
 
 from lib.I2CDevice import I2CDevice
 from lib.ModuleLooper import *
+from lib.Scheduler import SCHEDULER
 
 
 class LCD(ModuleLooper):
@@ -71,6 +72,7 @@ class LCD(ModuleLooper):
         self.__rows = rows
 
         self.__device = I2CDevice(address)
+        self.__lock = threading.RLock()  # Keeps the nibbles, cursor moves and characters of concurrent writes together
         self.__setup()
 
     def post(self, message, line=-1):
@@ -141,16 +143,25 @@ class LCD(ModuleLooper):
 
     def clear(self):
         """Clear LCD and set to home"""
-        self.__write(self.LCD_CLEARDISPLAY)
-        self.__write(self.LCD_RETURNHOME)
+        with self.__lock:
+            self.__write(self.LCD_CLEARDISPLAY)
+            self.__write(self.LCD_RETURNHOME)
 
     def finalize(self):
         super(LCD, self).finalize()
         self.reset()
 
     def looper(self):
+        sleep(self.__process_next())
+
+    def looper_async(self):
+        return self.runtime.then(self.runtime.run(self.__process_next), self.runtime.sleep)
+
+    def __process_next(self):
+        """Processes the next message in the queue, returns the seconds to wait before the next one"""
         if len(self.__message_queue) > 0:
             message = self.__message_queue.pop(0)
+            delay = 0.0
             if message is None:
                 self.clear()
             elif isinstance(message, bool):
@@ -158,9 +169,9 @@ class LCD(ModuleLooper):
             elif isinstance(message, str) and message.upper() in ["ON", "OFF"]:
                 self.backlight(message.upper() == "ON")
             elif isinstance(message, int):
-                sleep(message / 1000.0)
+                delay = message / 1000.0
             elif isinstance(message, float):
-                sleep(message)
+                delay = message
             elif isinstance(message, str) and message.upper() == "RESET":
                 self.__setup()
                 self.clear()
@@ -168,9 +179,9 @@ class LCD(ModuleLooper):
                 self.__set_line(message['message'], int(message['line']))
             else:
                 self.logger.debug("Unknown message: " + str(message))
-            sleep(0.1)
+            return delay + 0.1
         else:
-            sleep(0.5)
+            return 0.5
 
     def on_mqtt_message(self, path, payload):
         if len(path) == 1 and path[0] == "clear":
@@ -235,8 +246,9 @@ class LCD(ModuleLooper):
 
     # write a command to lcd
     def __write(self, cmd, mode=0):
-        self.__write_four_bits(mode | (cmd & 0xF0))
-        self.__write_four_bits(mode | ((cmd << 4) & 0xF0))
+        with self.__lock:
+            self.__write_four_bits(mode | (cmd & 0xF0))
+            self.__write_four_bits(mode | ((cmd << 4) & 0xF0))
 
     def __set(self, string):
         if string is not None:
@@ -246,18 +258,9 @@ class LCD(ModuleLooper):
                 if i < self.__rows:
                     self.__set_line(line, i + 1)
             if len(message) == 2 and len(messages) > 1:
-                Timer(int(message[1]) / 1000.0, self.__set, args=["".join(messages[1:])]).start()
+                SCHEDULER.schedule(int(message[1]) / 1000.0, self.__set, "".join(messages[1:]))
 
     def __set_line(self, string, line):
-        if line == 1:
-            self.__write(0x80)
-        if line == 2:
-            self.__write(0xC0)
-        if line == 3:
-            self.__write(0x94)
-        if line == 4:
-            self.__write(0xD4)
-
         alignment = re.search(r'^\|c\|(.*)', string, re.I)
         if alignment:
             string = alignment.group(1)
@@ -266,5 +269,15 @@ class LCD(ModuleLooper):
             string = string.rjust(int(math.floor((self.__cols - len(string)) / 2)) + len(string))
         string = string.ljust(self.__cols)
 
-        for char in string:
-            self.__write(ord(char), self.Rs)
+        with self.__lock:
+            if line == 1:
+                self.__write(0x80)
+            if line == 2:
+                self.__write(0xC0)
+            if line == 3:
+                self.__write(0x94)
+            if line == 4:
+                self.__write(0xD4)
+
+            for char in string:
+                self.__write(ord(char), self.Rs)
@@ -6,12 +6,13 @@
 import math
 import time
 
-import smbus
-
+from lib.I2CBus import I2C_BUS
 from lib.ModuleLooper import ModuleLooper
 
 
 class MCP23017(ModuleLooper):
+    events = ['on_mcp23017_change']
+
     IODIRA = 0x00  # Pin Register for direction
     IODIRB = 0x01  # Pin Register for direction
 
@@ -41,17 +42,14 @@ class MCP23017(ModuleLooper):
     def __init__(self, debug=False):
         super(MCP23017, self).__init__(debug=debug)
 
-        # for _ in self.__devices:
-        #     bus = smbus.SMBus(0) # Rev 1 Pi
-        #     self.__bus.append(smbus.SMBus(1))  # Rev 2 Pi
-        self.__bus = smbus.SMBus(1)
+        self.__bus = I2C_BUS
 
         self.__input_cache = [0x00, 0x00, 0x00, 0x00]
         self.__output_cache = [None, None, None, 0xF8 if self.__inverse_output else 0x00]
 
         for idx, device in enumerate(self.__devices):
             for io, iodir in enumerate([self.IODIRA, self.IODIRB]):
-                self.logger.debug("Initilizing device " + "0x{:02X}".format(self.__devices[idx]) + " " +
+                self.logger.debug(lambda: "Initilizing device " + "0x{:02X}".format(self.__devices[idx]) + " " +
                                   ['GPIOA', 'GPIOB'][io] + " (" + '0x{:02X}'.format(self.__gpios[io]) + ") to " +
                                   "0x{:02X}".format(self.__config[idx][io]) + " (" +
                                   "0b{:08b}".format(self.__config[idx][io]) + ")")
@@ -95,7 +93,7 @@ class MCP23017(ModuleLooper):
         else:
             self.__output_cache[idx] = self.__output_cache[idx] & ~(1 << real_bit)
         # self.logger.debug(">>> " + str(idx) + "," + str(olat) + "," + str(real_bit) + ": " + str(real_value))
-        self.logger.debug("Device " + '0x{:02X}'.format(device) + " " +
+        self.logger.debug(lambda: "Device " + '0x{:02X}'.format(device) + " " +
                           ['OLATA', 'OLATB'][idx % 2] + " (" + '0x{:02X}'.format(olat) + ") " +
                           "Bit " + str(real_bit) + ": " + str(value) + " " +
                           (("(inversed from " + str(real_value) + ") ") if self.__inverse_output else "") +
@@ -114,8 +112,8 @@ class MCP23017(ModuleLooper):
 
     def reset(self):
         for device in self.__devices:
-            for olat in self.__olats:
-                self.__bus.write_byte_data(device, olat, 0xFF if self.__inverse_output else 0x00)
+            self.__bus.batch(device, [('write_byte_data', olat, 0xFF if self.__inverse_output else 0x00)
+                                      for olat in self.__olats])
 
     def finalize(self):
         super(MCP23017, self).finalize()
@@ -131,28 +129,27 @@ class MCP23017(ModuleLooper):
         self.__read_all_registers()
         time.sleep(0.05)
 
+    def looper_async(self):
+        return self.runtime.then(self.runtime.run(self.__read_all_registers), lambda _: self.runtime.sleep(0.05))
+
     def __read_all_registers(self, notify=True):
         idx = 0
         for device in self.__devices:
-            for gpio in self.__gpios:
-                buttons = self.__bus.read_byte_data(device, gpio)
+            for buttons in self.__bus.batch(device, [('read_byte_data', gpio) for gpio in self.__gpios]):
                 if self.__input_cache[idx] != buttons:
                     # changed = True
                     for bit in range(8):
                         cache = self.get(bit, self.__input_cache[idx])
-                        current = self.get(idx * 8 + bit)
+                        current = self.get(bit, buttons)
 
                         if current != cache:
-                            self.logger.debug("0x{:02X}".format(self.__devices[int(math.floor(idx / 2.0))]) + " " +
-                                              ["GPIOA", "GPIOB"][idx % 2] + " " +
-                                              "(" + '0x{:02X}'.format(self.__gpios[idx % 2]) + ") bit:" + str(bit) +
-                                              " [" + str(idx * 8 + bit) + "]: " + str(cache) + " -> " + str(current))
+                            self.logger.debug("0x%02X %s (0x%02X) bit:%s [%s]: %s -> %s",
+                                              self.__devices[int(math.floor(idx / 2.0))], ["GPIOA", "GPIOB"][idx % 2],
+                                              self.__gpios[idx % 2], bit, idx * 8 + bit, cache, current)
                             if notify:
                                 if self.module_mqtt is not None:
                                     self.module_mqtt.publish("state/" + str(idx * 8 + bit), "ON" if current else "OFF",
                                                              module=self)
-                                for listener in self.listeners:
-                                    if hasattr(listener, 'on_mcp23017_change'):
-                                        listener.on_mcp23017_change(idx * 8 + bit, current)
+                                self.notify_listeners('on_mcp23017_change', idx * 8 + bit, current)
                     self.__input_cache[idx] = buttons
                 idx = idx + 1
@@ -3,49 +3,169 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
+import json
+import os
+import threading
 import traceback
+from collections import deque
 
 import paho.mqtt.client as mqtt
 
+from lib.Logger import WRITER
+from lib.Metrics import METRICS
 from lib.ModuleLooper import ModuleLooper
-from lib.Util import to_snake_case
+from lib.Scheduler import SCHEDULER
+from lib.TopicTrie import TopicTrie
+from lib.Util import monotonic, to_snake_case
+
+QUEUE_SAVE_DELAY = 1.0  # Seconds after a change the queue file is updated
+
+
+def to_policies(items):
+    """Parses `module:value` items to a dictionary of values by module ID"""
+    policies = {}
+    for item in [] if items is None else items:
+        module_id, value = item.rsplit(":", 1)
+        policies[module_id] = float(value)
+    return policies
+
+
+def _within_deadband(last, payload, deadband):
+    if str(last) == str(payload):
+        return True
+    try:
+        return abs(float(payload) - float(last)) < deadband
+    except (TypeError, ValueError):
+        return False
 
 
 class MQTT(ModuleLooper):
     """MQTT Module"""
 
-    def __init__(self, client_id, host, port=1883, debug=False):
+    def __init__(self, client_id, host, port=1883, deadbands=None, min_intervals=None, queue_size=1000, queue_file=None,
+                 json_modules=None, json_compat=False, debug=False):
         super(MQTT, self).__init__(debug=debug)
 
         self.logger.debug("Client ID: " + client_id)
         self.client_id = client_id
+        self.connected = False
+        self.suppressed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.__routes = TopicTrie()
+        self.__routed = []
+        self.__module_ids = {}
+        self.__deadbands = to_policies(deadbands)
+        self.__min_intervals = to_policies(min_intervals)
+        self.__json_modules = set([] if json_modules is None else json_modules)
+        self.__json_compat = json_compat
+        self.__last_values = {}
+        self.__pending = {}
+        self.__timers = {}
+        self.__lock = threading.Lock()
+        self.__queue = deque(maxlen=queue_size)
+        self.__queue_file = queue_file if queue_file else None
+        self.__queued_retained = {}
+        self.__save_task = None
+        self.__save_lock = threading.Lock()
+        self.__load_queue()
         self.client = mqtt.Client(self.client_id)
         self.client.on_connect = self.__on_connect
         self.client.on_disconnect = self.__on_disconnect
         self.client.will_set(self.client_id + "/state/status", "CLOSED", 1, True)
         self.client.reconnect_delay_set(min_delay=1, max_delay=60)
-        self.client.connect(host, port, 60)  # connect to broker
+        self.client.connect_async(host, port, 60)  # connects to the broker in the looper
         self.client.publish("status", "OPEN", 1, True)
         self.client.on_message = self.__on_message
+        self.subscribe("logger/dump", self.__dump_log)
+        self.subscribe("stats", self.__publish_stats)
+
+    def register(self, listener):
+        super(MQTT, self).register(listener)
+        self.__route_listeners()
+
+    def subscribe(self, topic_filter, callback):
+        """Subscribes `callback(path, payload)` to control messages matching the `topic_filter`.
+
+        :param topic_filter: filter relative to `{service}/control/`, may contain the `+` and `#` wildcards, e.g.
+                             `+/state` or `ws281x/#`
+        :param callback: called with the topic's levels after `{service}/control` and the payload
+        """
+        self.__routes.add(self.client_id + "/control/" + topic_filter, lambda path, payload: callback(path[2:], payload))
+
+    def publish(self, topic, payload=None, qos=0, retrain=False, module=None, force=False):
+        """Publishes the `payload` to `{service}/state[/{module}][/{topic}]`.
 
-    def publish(self, topic, payload=None, qos=0, retrain=False, module=None):
+        Publishes of modules with a deadband or a minimal interval configured are suppressed while the payload stays
+        within the deadband of the last published one and coalesced to the latest payload during the minimal interval.
+
+        :param force: publish regardless of the module's deadband and minimal interval
+        """
         path = [self.client_id, 'state']
+        module_id = None
         if module is not None:
-            path.append(module if isinstance(module, str) else to_snake_case(type(module).__name__, "-"))
+            module_id = module if isinstance(module, str) else self.__module_id(module)
+            path.append(module_id)
         if topic is not None and topic != "":
             path.append(topic)
-        self.logger.debug("Publishing: " + "/".join(path) + " qos=" + str(qos) + ", retain=" + str(retrain) + ": " +
-                          str(payload))
-        self.client.publish("/".join(path), payload, qos, retrain)
+        full_topic = "/".join(path)
+        if force or self.__admit(full_topic, module_id, payload, qos, retrain):
+            self.__send(full_topic, payload, qos, retrain)
+
+    def publish_state(self, fields, qos=0, retrain=False, module=None, force=False, topics=None):
+        """Publishes one logical state change consisting of several `fields`.
+
+        For modules in JSON mode the fields are published as one JSON document to `{service}/state/{module}/json`
+        nested by the topic levels, e.g. `[("0/raw", 1500), ("0/percent", 50)]` as `{"0": {"raw": 1500, "percent": 50}}`
+        (the module's own topic as `value`). Otherwise, or in compatibility mode, every field is published to its own
+        topic as a string.
+
+        :param fields: list of `(topic, value)` tuples, topics relative to the module's topic
+        :param topics: dictionary of the topics relative to `{service}/state` the fields are published to on their own
+                       by field topic, for fields not published under the module's topic
+        """
+        module_id = module if module is None or isinstance(module, str) else self.__module_id(module)
+        json_mode = module_id in self.__json_modules or (module_id is not None and "*" in self.__json_modules)
+        if json_mode:
+            document = {}
+            for topic, value in fields:
+                levels = topic.split("/") if topic != "" else ["value"]
+                node = document
+                for level in levels[:-1]:
+                    node = node.setdefault(level, {})
+                node[levels[-1]] = value
+            self.publish("json", json.dumps(document, sort_keys=True), qos, retrain, module=module_id, force=force)
+        if not json_mode or self.__json_compat:
+            for topic, value in fields:
+                if topics is not None and topic in topics:
+                    self.publish(topics[topic], str(value), qos, retrain, force=force)
+                else:
+                    self.publish(topic, str(value), qos, retrain, module=module_id, force=force)
 
     def looper(self):
         self.client.loop_forever(retry_first_connection=True)
 
     def finalize(self):
         super(MQTT, self).finalize()
+        for topic in list(self.__timers.keys()):
+            self.__timers[topic].cancel()
+            self.__flush(topic)
         self.client.publish("status", "CLOSED", 1, True)
         self.logger.debug("Disconnecting from MQTT broker...")
         self.client.disconnect()
+        with self.__lock:
+            if self.__save_task is not None:
+                self.__save_task.cancel()
+        self.__save_queue()  # Waits for a scheduled save in progress
+
+    def __dump_log(self, path, payload):
+        """Publishes the last log records of the module with the ID in the `payload` (all modules if empty)."""
+        records = WRITER.dump(payload if payload != "" else None)
+        self.publish("dump", "\n".join(records), module="logger", force=True)
+
+    def __publish_stats(self, path, payload):
+        """Publishes the statistics of all loopers by module ID."""
+        self.publish("stats", json.dumps(METRICS.looper_stats(), sort_keys=True), force=True)
 
     def __on_connect(self, client, userdata, flags, rc):
         """The callback for when the client receives a CONNACK response from the server."""
@@ -56,9 +176,43 @@ class MQTT(ModuleLooper):
         # renewed.
         # client.subscribe("$SYS/#")
         client.subscribe(self.client_id + "/control/#")
+        with self.__lock:
+            self.__last_values = {}  # Republish everything after reconnecting
+        if rc == 0:
+            self.__publish_queue()
         self.publish("status", "OPEN", 1, True)
 
+    def __publish_queue(self):
+        """Publishes the queued messages and marks the client `connected` once the queue is empty.
+
+        Messages published meanwhile are still queued behind the older ones, so that e.g. the broker does not end up
+        retaining a queued value published after a newer one.
+        """
+        while True:
+            with self.__lock:
+                if len(self.__queue) == 0:
+                    self.connected = True
+                    return
+                queued = list(self.__queue)
+                self.__queue.clear()
+                self.__queued_retained = {}
+                self.__schedule_save()
+            self.logger.info("Publishing " + str(len(queued)) + " queued messages")
+            for index, (topic, payload, qos, retain) in enumerate(queued):
+                info = self.client.publish(topic, payload, qos, retain)
+                if info is not None and info.rc == mqtt.MQTT_ERR_NO_CONN:  # Disconnected again
+                    unsent = queued[index:] if qos == 0 else queued[index + 1:]  # QoS > 0 is kept by the client
+                    with self.__lock:
+                        pending = list(self.__queue)
+                        self.__queue.clear()
+                        self.__queued_retained = {}
+                        for message in unsent + pending:
+                            self.__enqueue(message)
+                    return
+
     def __on_disconnect(self, client, userdata, rc):
+        with self.__lock:
+            self.connected = False
         if rc != 0:
             self.logger.error("Unexpected disconnection with code " + str(rc) + ": " + str(userdata))
 
@@ -75,11 +229,149 @@ class MQTT(ModuleLooper):
             #         if hasattr(self, 'interrupted'):
             #             self.interrupted = True
 
-            for listener in self.listeners:
-                module_name = to_snake_case(type(listener).__name__, "-")
-                if len(path) > 2 and path[0] == self.client_id and path[1] == "control" and path[2] == module_name:
-                    if hasattr(listener, 'on_mqtt_message'):
-                        listener.on_mqtt_message(path[3:], msg.payload)  # {service}/control/{module}/#
+            for handler in self.__routes.match(msg.topic):
+                handler(path, msg.payload)
         except Exception as e:
             self.logger.error("Unexpected error: " + e.message)
             traceback.print_exc()
+
+    def __route_listeners(self):
+        """Routes `{service}/control/{module}/#` to listeners registered since the last call."""
+        for listener in self.listeners[len(self.__routed):]:
+            self.__routed.append(listener)
+            if hasattr(listener, 'on_mqtt_message'):
+                module_id = to_snake_case(type(listener).__name__, "-")
+                self.__routes.add(self.client_id + "/control/" + module_id + "/#", self.__listener_route(listener))
+
+    @staticmethod
+    def __listener_route(listener):
+        def route(path, payload):  # {service}/control/{module}/#
+            start = monotonic()
+            try:
+                listener.on_mqtt_message(path[3:], payload)
+            finally:
+                METRICS.observe(getattr(listener, 'module_id', type(listener).__name__), "mqtt", "on_mqtt_message",
+                                monotonic() - start)
+
+        return route
+
+    def __module_id(self, module):
+        clazz = type(module)
+        if clazz not in self.__module_ids:
+            self.__module_ids[clazz] = to_snake_case(clazz.__name__, "-")
+        return self.__module_ids[clazz]
+
+    def __policy(self, policies, module_id):
+        return policies.get(module_id, policies.get("*", None)) if module_id is not None else None
+
+    def __admit(self, topic, module_id, payload, qos, retain):
+        """Whether to publish now, otherwise the publish is suppressed or postponed till the end of the interval"""
+        deadband = self.__policy(self.__deadbands, module_id)
+        interval = self.__policy(self.__min_intervals, module_id)
+        if deadband is None and interval is None:
+            return True
+
+        with self.__lock:
+            last = self.__last_values.get(topic, None)
+            if last is None:
+                return True
+            elif deadband is not None and _within_deadband(last[0], payload, deadband):
+                self.__pending.pop(topic, None)
+                self.suppressed = self.suppressed + 1
+                return False
+            elapsed = monotonic() - last[1]
+            if interval is not None and elapsed < interval:
+                self.__pending[topic] = (payload, qos, retain)
+                if topic not in self.__timers:
+                    self.__timers[topic] = SCHEDULER.schedule(interval - elapsed, self.__flush, topic)
+                self.coalesced = self.coalesced + 1
+                return False
+            self.__pending.pop(topic, None)
+            return True
+
+    def __flush(self, topic):
+        """Publishes the latest payload postponed during the minimal interval"""
+        with self.__lock:
+            self.__timers.pop(topic, None)
+            pending = self.__pending.pop(topic, None)
+        if pending is not None:
+            self.__send(topic, pending[0], pending[1], pending[2])
+
+    def __send(self, topic, payload, qos, retain):
+        self.logger.debug("Publishing: " + topic + " qos=" + str(qos) + ", retain=" + str(retain) + ": " + str(payload))
+        with self.__lock:
+            self.__last_values[topic] = (payload, monotonic())
+            if not self.connected:
+                self.__enqueue((topic, payload, qos, retain))
+                return
+        info = self.client.publish(topic, payload, qos, retain)
+        if info is not None and info.rc == mqtt.MQTT_ERR_NO_CONN and qos == 0:  # QoS > 0 is kept by the client
+            with self.__lock:
+                self.__enqueue((topic, payload, qos, retain))
+
+    def __enqueue(self, message):
+        """Queues the `message` till reconnected.
+
+        Only the latest message per retained topic is kept. When the queue is full the oldest not retained message is
+        dropped, the oldest retained one only if there is no other.
+        """
+        if self.__queue.maxlen == 0:
+            self.dropped = self.dropped + 1
+            return
+        self.__schedule_save()
+        if message[3]:
+            previous = self.__queued_retained.pop(message[0], None)
+            if previous is not None:
+                self.__queue.remove(previous)
+            self.__queued_retained[message[0]] = message
+        if len(self.__queue) == self.__queue.maxlen:
+            dropped = next((queued for queued in self.__queue if not queued[3]), self.__queue[0])
+            self.__queue.remove(dropped)
+            if dropped[3]:
+                del self.__queued_retained[dropped[0]]
+            self.dropped = self.dropped + 1
+        self.__queue.append(message)
+
+    def __schedule_save(self):
+        """Schedules updating the queue file after a change of the queue, so that the queue survives a power loss.
+
+        Needs to be called holding the lock.
+        """
+        if self.__queue_file is not None and self.__save_task is None:
+            self.__save_task = SCHEDULER.schedule(QUEUE_SAVE_DELAY, self.__save_queue)
+
+    def __load_queue(self):
+        if self.__queue_file is None or not os.path.isfile(self.__queue_file):
+            return
+        try:
+            with open(self.__queue_file, "r") as fp:
+                for topic, payload, qos, retain in json.load(fp):
+                    self.__enqueue((str(topic), payload, qos, retain))
+            self.logger.info("Loaded " + str(len(self.__queue)) + " queued messages from " + self.__queue_file)
+        except (IOError, OSError, ValueError) as e:
+            self.logger.error("Cannot load queued messages from " + self.__queue_file + ": " + str(e))
+
+    def __save_queue(self):
+        """Writes the queued messages to the queue file (removes it if there are none).
+
+        The saves are serialized from the snapshot to the rename, so that they do not write the same temporary file
+        concurrently and the last one saved is the latest snapshot.
+        """
+        with self.__save_lock:
+            with self.__lock:
+                self.__save_task = None
+                queued = list(self.__queue)
+            if self.__queue_file is None:
+                return
+            temporary_file = self.__queue_file + ".tmp"
+            try:
+                if len(queued) == 0:
+                    if os.path.isfile(self.__queue_file):
+                        os.remove(self.__queue_file)
+                    return
+                with open(temporary_file, "w") as fp:
+                    json.dump(queued, fp)
+                os.rename(temporary_file, self.__queue_file)
+                self.logger.debug("Saved %d queued messages to %s", len(queued), self.__queue_file)
+            except (IOError, OSError, TypeError, ValueError) as e:
+                self.logger.error("Cannot save queued messages to " + self.__queue_file + ": " + str(e))
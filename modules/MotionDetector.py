@@ -11,6 +11,8 @@ from lib.Module import Module
 class MotionDetector(Module):
     """Motion detector module using HC-SR501 PIR (https://www.mpja.com/download/31227sc.pdf)"""
 
+    events = ['on_motion_change']
+
     module_mqtt = None
 
     def __init__(self, pin=7, debug=False):
@@ -32,6 +34,4 @@ class MotionDetector(Module):
         self.logger.info("Motion " + ("detected!" if state else "stopped."))
         if self.module_mqtt is not None:
             self.module_mqtt.publish("", "OPEN" if state else "CLOSED", module=self)
-        for listener in self.listeners:
-            if hasattr(listener, 'on_motion_change'):
-                listener.on_motion_change(state)
+        self.notify_listeners('on_motion_change', state)
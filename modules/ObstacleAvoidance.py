@@ -4,9 +4,9 @@
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
 import time
-from threading import Timer
 
 from lib.Module import Module
+from lib.Scheduler import SCHEDULER
 
 MODE_RUNNING = "RUNNING"
 MODE_TURNING_LEFT = "TURNING_LEFT"
@@ -167,11 +167,11 @@ class ObstacleAvoidance(Module):
                 self.__iterations += 1
                 self.__last_distance = distance
                 self.__distances.append(distance)
-                Timer(1.0, self.__update_wheels).start()
+                SCHEDULER.schedule(1.0, self.__update_wheels)
             else:  # Distance not acquired, try again
                 self.__left_speed = self.__right_speed = 0
                 self.__interval = 0
-                Timer(1.0, self.__update_wheels).start()
+                SCHEDULER.schedule(1.0, self.__update_wheels)
         else:
             self.logger.info("Mode: " + self.__mode + ", "
                              + "Left speed: " + str(self.__left_speed) + ", "
@@ -6,9 +6,10 @@
 #
 import atexit
 import time
-from threading import Timer
 
+from lib.I2CBus import I2C_BUS
 from lib.Module import Module
+from lib.Scheduler import SCHEDULER
 
 PWM = 0
 WS2812 = 1
@@ -98,8 +99,8 @@ class PanTilt(Module):
 
         if self.__i2c is None:
             try:
-                from smbus import SMBus
-                self.__i2c = SMBus(1)
+                I2C_BUS.open()
+                self.__i2c = I2C_BUS
             except ImportError:
                 if version_info[0] < 3:
                     raise ImportError("This library requires python-smbus\n" +
@@ -269,10 +270,10 @@ class PanTilt(Module):
 
         self.setup()
 
-        self.__i2c_write_block(self.REG_WS2812, self.__pixels[:32])
-        self.__i2c_write_block(self.REG_WS2812 + 32, self.__pixels[32:64])
-        self.__i2c_write_block(self.REG_WS2812 + 64, self.__pixels[64:])
-        self.__i2c_write_byte(self.REG_UPDATE, 1)
+        self.__i2c_batch([('write_i2c_block_data', self.REG_WS2812, self.__pixels[:32]),
+                          ('write_i2c_block_data', self.REG_WS2812 + 32, self.__pixels[32:64]),
+                          ('write_i2c_block_data', self.REG_WS2812 + 64, self.__pixels[64:]),
+                          ('write_byte_data', self.REG_UPDATE, 1)])
 
     def servo_enable(self, index, state):
         """Enable or disable a servo.
@@ -376,9 +377,7 @@ class PanTilt(Module):
             if self.__servo_timeouts[index] is not None:
                 self.__servo_timeouts[index].cancel()
 
-            self.__servo_timeouts[index] = Timer(self.__idle_timeout, self.__servo_stop[index])
-            self.__servo_timeouts[index].daemon = True
-            self.__servo_timeouts[index].start()
+            self.__servo_timeouts[index] = SCHEDULER.schedule(self.__idle_timeout, self.__servo_stop[index])
 
     def __atexit(self):
         if self.__servo1_timeout is not None:
@@ -469,19 +468,16 @@ class PanTilt(Module):
 
         return self.__servo_min[servo_index], self.__servo_max[servo_index]
 
-    def __i2c_write_block(self, reg, data):
-        if type(data) is list:
-            for x in range(self.__i2c_retries):
-                try:
-                    self.__i2c.write_i2c_block_data(self.__i2c_address, reg, data)
-                    return
-                except IOError:
-                    time.sleep(self.__i2c_retry_time)
-                    continue
+    def __i2c_batch(self, operations):
+        for x in range(self.__i2c_retries):
+            try:
+                self.__i2c.batch(self.__i2c_address, operations)
+                return
+            except IOError:
+                time.sleep(self.__i2c_retry_time)
+                continue
 
-            raise IOError("Failed to write block")
-        else:
-            raise ValueError("Value must be a list")
+        raise IOError("Failed to write batch")
 
     def __i2c_write_word(self, reg, data):
         if type(data) is int:
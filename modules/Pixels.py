@@ -61,7 +61,7 @@ class Pixels(Module):
                                          self.LED_BRIGHTNESS, self.LED_CHANNEL, self.LED_STRIP)
 
     def set_color(self, pixel, red, green, blue):
-        self.logger.debug("Setting " + str(pixel) + " to " + str(red) + "," + str(green) + "," + str(blue))
+        self.logger.debug("Setting %s to %s,%s,%s", pixel, red, green, blue)
         self.__pixel_leds[pixel] = Color(red, green, blue)
         self.__update(self.__pixel_leds)
 
@@ -105,7 +105,7 @@ class Pixels(Module):
             red = (color & (255 << 16)) >> 16
             green = (color & (255 << 8)) >> 8
             blue = (color & 255)
-            self.logger.debug("Updating " + str(pixel) + " to " + str(red) + "," + str(green) + "," + str(blue))
+            self.logger.debug("Updating %s to %s,%s,%s", pixel, red, green, blue)
             if self.module_mqtt is not None:
                 self.module_mqtt.publish(str(pixel), str(red) + "," + str(green) + "," + str(blue), module=self)
         self.__strip.show()
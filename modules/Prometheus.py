@@ -1,8 +1,12 @@
 import socket
 
 import time
-from prometheus_client import Gauge, start_http_server
+from prometheus_client import Gauge, REGISTRY, start_http_server
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
 
+from lib.EventBus import BUS
+from lib.I2CBus import I2C_BUS
+from lib.Metrics import METRICS
 from lib.ModuleLooper import ModuleLooper
 
 
@@ -36,6 +40,7 @@ class Prometheus(ModuleLooper):
         self.__switch_state_metric = Gauge("switch", "Switch", ['host', 'label'])
         self.__distance_metric = Gauge("ultrasonic_distance", "Ultrasonic distance", ['host', 'label'])
         self.__water_state_metric = Gauge("water_detector", "Camera state", ['host', 'label'])
+        REGISTRY.register(self)
 
     def initialize(self):
         start_http_server(self.__port)
@@ -44,10 +49,62 @@ class Prometheus(ModuleLooper):
     def finalize(self):
         self.__state_metric.labels(host=self.__host, label="default").set(0)
 
+    def collect(self):
+        """Exports the modules' latency histograms, looper statistics (see `lib.Metrics`), event counts (see
+        `lib.EventBus`) and I2C bus usage (see `lib.I2CBus`) when scraped."""
+        histogram = HistogramMetricFamily("raspi_project_handler_seconds",
+                                          "Duration of the modules' looper iterations, MQTT and listener callbacks",
+                                          labels=['host', 'module', 'kind', 'handler'])
+        for module, kind, handler, cumulative, count, total in METRICS.histograms():
+            buckets = [(str(bound), value) for bound, value in zip(METRICS.buckets, cumulative)]
+            histogram.add_metric([self.__host, module, kind, handler], buckets + [("+Inf", count)], total)
+        yield histogram
+
+        iterations = CounterMetricFamily("raspi_project_looper_iterations", "Looper iterations", labels=['host', 'module'])
+        exceptions = CounterMetricFamily("raspi_project_looper_exceptions", "Exceptions swallowed by the looper",
+                                         labels=['host', 'module'])
+        cpu = CounterMetricFamily("raspi_project_looper_cpu_seconds", "CPU time consumed by the looper thread",
+                                  labels=['host', 'module'])
+        for module, stats in sorted(METRICS.looper_stats().items()):
+            iterations.add_metric([self.__host, module], stats['iterations'])
+            exceptions.add_metric([self.__host, module], stats['exceptions'])
+            cpu.add_metric([self.__host, module], stats['cpu'])
+        yield iterations
+        yield exceptions
+        yield cpu
+
+        published = CounterMetricFamily("raspi_project_events_published", "Events notified by the modules",
+                                        labels=['host', 'event'])
+        delivered = CounterMetricFamily("raspi_project_events_delivered", "Events delivered to the listeners",
+                                        labels=['host', 'event'])
+        dropped = CounterMetricFamily("raspi_project_events_dropped", "Events dropped for slow listeners",
+                                      labels=['host', 'event'])
+        for event, stats in sorted(BUS.stats().items()):
+            published.add_metric([self.__host, event], stats['published'])
+            delivered.add_metric([self.__host, event], stats['delivered'])
+            dropped.add_metric([self.__host, event], stats['dropped'])
+        yield published
+        yield delivered
+        yield dropped
+
+        transactions = CounterMetricFamily("raspi_project_i2c_transactions", "I2C transactions per device",
+                                           labels=['host', 'device'])
+        bus_time = CounterMetricFamily("raspi_project_i2c_seconds", "Time the I2C bus was used per device",
+                                       labels=['host', 'device'])
+        for address, stats in sorted(I2C_BUS.stats().items()):
+            transactions.add_metric([self.__host, "0x%02X" % address], stats['transactions'])
+            bus_time.add_metric([self.__host, "0x%02X" % address], stats['seconds'])
+        yield transactions
+        yield bus_time
+
     def looper(self):
         self.__state_metric.labels(host=self.__host, label="default").set(1)
         time.sleep(self.__interval)
 
+    def looper_async(self):
+        self.__state_metric.labels(host=self.__host, label="default").set(1)
+        return self.runtime.sleep(self.__interval)
+
     def on_bluetooth_message(self, message):
         self.__bluetooth_message_count_metric.labels(host=self.__host, type='incoming', device='default').inc()
 
@@ -13,6 +13,8 @@ from lib.ModuleLooper import ModuleLooper
 class RGB(ModuleLooper):
     """RGB strip module"""
 
+    events = ['on_rgb_change']
+
     PIN_RED = 17
     PIN_GREEN = 22
     PIN_BLUE = 24
@@ -56,12 +58,11 @@ class RGB(ModuleLooper):
         self.__pi.set_PWM_dutycycle(self.PIN_GREEN, green)
         self.__pi.set_PWM_dutycycle(self.PIN_BLUE, blue)
         if update and self.module_mqtt is not None:
-            self.module_mqtt.publish("", str(red) + "," + str(green) + "," + str(blue), module=self)
-            self.module_mqtt.publish("percent", int((red + green + blue) * 100.0 / 255.0 / 3.0))
+            self.module_mqtt.publish_state([("", str(red) + "," + str(green) + "," + str(blue)),
+                                            ("percent", int((red + green + blue) * 100.0 / 255.0 / 3.0))],
+                                           module=self, topics={"percent": "percent"})
 
-            for listener in self.listeners:
-                if hasattr(listener, 'on_rgb_change'):
-                    listener.on_rgb_change(red, green, blue)
+            self.notify_listeners('on_rgb_change', red, green, blue)
 
     def on_mqtt_message(self, path, payload):
         rgb = payload.split(",")
@@ -11,6 +11,8 @@ from lib.Module import Module
 class RPI(Module):
     """Raspberry Pi essentials module"""
 
+    events = ['on_display_change']
+
     module_mqtt = None
 
     def __init__(self, debug=False):
@@ -36,6 +38,4 @@ class RPI(Module):
         if self.module_mqtt is not None:
             self.module_mqtt.publish("display", "ON" if state else "OFF", module=self)
 
-        for listener in self.listeners:
-            if hasattr(listener, 'on_display_change'):
-                listener.on_display_change(state)
+        self.notify_listeners('on_display_change', state)
@@ -23,6 +23,8 @@ ACK = "ACK"
 class SerialReader(ModuleLooper):
     """Serial reader module"""
 
+    events = ['on_serial_message']
+
     __port_threads = []
     __receiving_serial_port = None
     __mode = 0
@@ -197,7 +199,5 @@ class SerialReader(ModuleLooper):
 
     def __write_result__(self):
         self.logger.info("Message: " + self.__content)
-        for listener in self.listeners:
-            if hasattr(listener, 'on_serial_message'):
-                listener.on_serial_message(self.__content)
+        self.notify_listeners('on_serial_message', self.__content)
         self.__content = ""
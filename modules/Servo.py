@@ -3,10 +3,9 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
-import threading
-
 from lib.Module import Module
 from lib.PCA9685 import PCA9685
+from lib.Scheduler import SCHEDULER
 
 
 class Servo(Module):
@@ -24,6 +23,7 @@ class Servo(Module):
 
         self.__pwm = PCA9685(0x40, debug)
         self.__pwm.setPWMFreq(50)
+        self.__stop_task = None
 
     def initialize(self):
         super(Servo, self).initialize()
@@ -57,15 +57,15 @@ class Servo(Module):
             position = position_min
         self.logger.debug(str(original) + " -> " + str(position))
 
-        if self.module_mqtt is not None:
-            self.module_mqtt.publish(str(servo) + "/raw", position, module=self)
-
         percent = 100 - int(float(position - position_min) * 100.0 / float(position_max - position_min))
         if self.module_mqtt is not None:
-            self.module_mqtt.publish(str(servo) + "/percent", percent, module=self)
+            self.module_mqtt.publish_state([(str(servo) + "/raw", position), (str(servo) + "/percent", percent)],
+                                           module=self)
 
         self.__pwm.setServoPulse(servo, position)
-        threading.Timer(0.5, self.stop_servos).start()
+        if self.__stop_task is not None:
+            self.__stop_task.cancel()
+        self.__stop_task = SCHEDULER.schedule(0.5, self.stop_servos)
 
     def set_position_percent(self, servo, percent):
         position_min = self.__servo_mins[servo]
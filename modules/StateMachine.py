@@ -5,8 +5,10 @@
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
 import ast
+import hashlib
 import json
 import os
+import threading
 import time
 import traceback
 import yaml
@@ -19,6 +21,13 @@ from lib.ColorGRB import ColorGRB
 from lib.FileWatcherHandler import observe
 from lib.ModuleLooper import ModuleLooper
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+YAML_LOADER = yaml.CLoader if hasattr(yaml, 'CLoader') else yaml.Loader
+
 
 def _reference_based_value(value, reference):
     if value is None:
@@ -38,6 +47,7 @@ def _reference_based_value(value, reference):
 
 class StateMachine(ModuleLooper):
     MAX_INDEX = 50
+    CACHE_SCHEMA = 1
 
     module_bluetooth = None
     module_lcd = None
@@ -47,11 +57,12 @@ class StateMachine(ModuleLooper):
     __initial_state = None
     __current_state = None
     __states = {}
+    __indices = {}
+    __predicates = {}
     __global_state = {}
     __devices = {}
     __variables = {}
     __actions = {}
-    __under_change = False
     __templates = {}
     __template_variables_cache = None
 
@@ -63,15 +74,27 @@ class StateMachine(ModuleLooper):
         self.__transactional = transactional
         self.__optimize = optimize
         self.__global_state = {}
+        self.__actions = {}
+        self.__lock = threading.RLock()
+        self.__actions_queued = threading.Condition(self.__lock)
         self.__description_file = description_file
-        self.__optimized_description_file = os.path.splitext(description_file)[0] + '.optimized.yml'
+        self.__cache_file = os.path.splitext(description_file)[0] + '.optimized.cache'
         self.__configuration_observer = observe(description_file, self.initialize, self.logger)
 
     def initialize(self):
         super(StateMachine, self).initialize()
+        self.__transaction_start()
+        try:
+            self.__load()
+        finally:
+            self.__transaction_end()
+
+    def __load(self):
         self.__initial_state = None
         self.__current_state = None
         self.__states = {}
+        self.__indices = {}
+        self.__predicates = {}
         self.__devices = {}
         self.__variables = {}
         self.__template_variables_cache = None
@@ -83,17 +106,22 @@ class StateMachine(ModuleLooper):
         if self.module_ws281x_indicators is not None:
             self.module_ws281x_indicators.reset()
 
-        reload_file = not self.__optimize or not os.path.isfile(self.__optimized_description_file) \
-            or os.stat(self.__description_file).st_mtime > os.stat(self.__optimized_description_file).st_mtime
+        with open(self.__description_file, "rb") as fp:
+            source = fp.read()
+        digest = hashlib.sha1(source).hexdigest()
+        cached = self.__load_cache(digest) if self.__optimize else None
+        reload_file = cached is None
 
-        description_file = self.__description_file if reload_file else self.__optimized_description_file
-
-        self.logger.info("Description file: " + description_file + "...")
-        try:
-            descriptions = yaml.load_all(open(description_file, "r"))
-        except ParserError:
-            descriptions = []
-            reload_file = False
+        if reload_file:
+            self.logger.info("Description file: " + self.__description_file + "...")
+            try:
+                descriptions = list(yaml.load_all(source, Loader=YAML_LOADER))
+            except ParserError:
+                descriptions = []
+                reload_file = False
+        else:
+            self.logger.info("Description file: " + self.__cache_file + "...")
+            descriptions = [cached]
 
         for description in descriptions:
             self.__devices = description['devices']
@@ -187,16 +215,17 @@ class StateMachine(ModuleLooper):
                 state['conditions'] = conditions
 
         if reload_file:
-            yaml.dump(
-                {
-                    'devices': self.__devices,
-                    'vars': self.__variables,
-                    'initial_state': self.__initial_state,
-                    'states': self.__states.values()
-                },
-                file(self.__optimized_description_file, 'w'))
+            self.__save_cache(digest, {
+                'devices': self.__devices,
+                'vars': self.__variables,
+                'initial_state': self.__initial_state,
+                'states': list(self.__states.values())
+            })
 
         self.__global_state = {}
+        for name, state in self.__states.items():
+            self.__indices[name] = self.__index(state)
+            self.__predicates[name] = [self.__predicate(condition) for condition in state['conditions']]
 
         if self.module_mcp23017 is not None:
             for bit, value in enumerate(self.module_mcp23017.get_all()):
@@ -206,6 +235,32 @@ class StateMachine(ModuleLooper):
             self.logger.info("Transiting to initial state: " + str(self.__initial_state) + " ...")
             self.transit(self.__initial_state)
 
+    def __load_cache(self, digest):
+        """Expanded description from the cache file if it was created from the description file with `digest`"""
+        if not os.path.isfile(self.__cache_file):
+            return None
+        try:
+            with open(self.__cache_file, "rb") as fp:
+                cache = pickle.load(fp)
+        except Exception as e:
+            self.logger.error("Invalid cache file " + self.__cache_file + ": " + str(e))
+            return None
+        if not isinstance(cache, dict) or cache.get('schema') != self.CACHE_SCHEMA or cache.get('source') != digest:
+            self.logger.info("Cache file " + self.__cache_file + " is stale")
+            return None
+        return cache['description']
+
+    def __save_cache(self, digest, description):
+        """Stores the expanded `description` of the description file with `digest` to the cache file"""
+        temporary_file = self.__cache_file + ".tmp"
+        try:
+            with open(temporary_file, "wb") as fp:
+                pickle.dump({'schema': self.CACHE_SCHEMA, 'source': digest, 'description': description}, fp,
+                            pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary_file, self.__cache_file)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            self.logger.error("Cannot write cache file " + self.__cache_file + ": " + str(e))
+
     def start(self):
         if self.__transactional:
             super(StateMachine, self).start()
@@ -221,14 +276,18 @@ class StateMachine(ModuleLooper):
     def transit(self, new_state_name):
         self.logger.info("Transiting " + (self.__current_state['name'] if self.__current_state is not None else "N/A") +
                          " -> " + new_state_name)
-        self.__current_state = self.__states[new_state_name]
-
-        self.logger.debug("Evaluating gate \"ENTER\" in \"" + str(new_state_name) + "\" state")
-        self.__evaluate("ENTER")
-        self.logger.debug("Evaluating gate \"INITIALIZED\" in \"" + str(new_state_name) + "\" state")
-        self.__evaluate("INITIALIZED")
+        self.__transaction_start()
+        try:
+            self.__current_state = self.__states[new_state_name]
+
+            self.logger.debug("Evaluating gate \"ENTER\" in \"%s\" state", new_state_name)
+            self.__evaluate("ENTER")
+            self.logger.debug("Evaluating gate \"INITIALIZED\" in \"%s\" state", new_state_name)
+            self.__evaluate("INITIALIZED")
+        finally:
+            self.__transaction_end()
         if self.__current_state is not None and new_state_name == self.__current_state['name']:
-            self.logger.debug("Evaluating gate \"NORMAL\" in \"" + str(new_state_name) + "\" state")
+            self.logger.debug("Evaluating gate \"NORMAL\" in \"%s\" state", new_state_name)
 
     def get_state(self, item, key=None, state=None):
         state = self.__global_state if state is None else state
@@ -245,17 +304,20 @@ class StateMachine(ModuleLooper):
         kind = item if isinstance(item, str) else self.__get_kind(item)
         key = str(key) if isinstance(item, str) else self.__get_key(item)
 
-        if kind not in self.__global_state.keys() or self.__global_state[kind] is None:
-            self.__global_state[kind] = {}
-
-        previous_state = deepcopy(self.__global_state) if evaluate else None
-        previous_value = self.get_state(kind, key) if evaluate else None
-        if not evaluate or previous_value != value:
-            self.logger.debug(kind + "[" + str(key) + "]: " + str(previous_value) + " -> " + str(value))
-            self.__global_state[kind][key] = value
-            if evaluate:
-                self.__evaluate("NORMAL", previous_state)
-            self.__template_variables_cache = None
+        self.__transaction_start()
+        try:
+            if kind not in self.__global_state.keys() or self.__global_state[kind] is None:
+                self.__global_state[kind] = {}
+
+            previous_value = self.get_state(kind, key) if evaluate else None
+            if not evaluate or previous_value != value:
+                self.logger.debug("%s[%s]: %s -> %s", kind, key, previous_value, value)
+                self.__global_state[kind][key] = value
+                if evaluate:
+                    self.__evaluate("NORMAL", (kind, key, previous_value))
+                self.__template_variables_cache = None
+        finally:
+            self.__transaction_end()
         return previous_value != value
 
     def on_bluetooth_message(self, message):
@@ -305,18 +367,19 @@ class StateMachine(ModuleLooper):
         self.set_state("mcp23017", bit, value)
 
     def looper(self):
-        self.__transaction_start()
-        actions = deepcopy(self.__actions)
-        self.__actions = {}
-        self.__transaction_end()
+        with self.__lock:
+            while len(self.__actions) == 0 and not self.is_interrupted():
+                self.__actions_queued.wait(0.5)
+            actions = self.__actions
+            self.__actions = {}
 
         if actions != {}:
-            self.logger.debug("Actions: " + str(actions))
+            self.logger.debug("Actions: %s", actions)
 
         goto_action = None
 
         for kind, rest in actions.items():
-            self.logger.debug(" - " + kind + ": " + str(rest))
+            self.logger.debug(" - %s: %s", kind, rest)
             if kind == 'GOTO':
                 goto_action = rest
             elif kind == 'bluetooth' and self.module_bluetooth is not None:
@@ -361,8 +424,6 @@ class StateMachine(ModuleLooper):
                 time.sleep(int(delay) / 1000.0)
             self.transit(state)
 
-        time.sleep(0.4)
-
     def __get_kind(self, item):
         if isinstance(item, str):
             return "STR"
@@ -488,69 +549,141 @@ class StateMachine(ModuleLooper):
             traceback.print_exc()
             return None
 
-    def __evaluate(self, gate="NORMAL", previous_state=None):
+    def __index(self, state):
+        """Indices of the state's conditions which may fire in the NORMAL gate by the `(kind, key)` they refer to
+
+        Conditions with a `NORMAL` gate expression may fire on any change, those are listed under `None` and included
+        in each device's indices. Indices are in the original order of the conditions.
+        """
+        any_change = []
+        referring = {}
+        for idx, condition in enumerate(state['conditions'] if 'conditions' in state.keys() else []):
+            if 'expressions' not in condition.keys() \
+                    or 'only' in condition.keys() and condition['only'].upper() != "NORMAL":
+                continue
+            gates = [expression.upper() for expression in condition['expressions'] if isinstance(expression, str)]
+            if len(gates) > 0:
+                if all(gate == "NORMAL" for gate in gates):
+                    any_change.append(idx)
+                continue
+            for expression in condition['expressions']:
+                if 'only' not in expression.keys() or expression['only'].upper() == "NORMAL":
+                    device = (self.__get_kind(expression), self.__get_key(expression))
+                    if idx not in referring.setdefault(device, []):
+                        referring[device].append(idx)
+
+        index = {None: any_change}
+        for device, indices in referring.items():
+            index[device] = sorted(indices + any_change)
+        return index
+
+    def __predicate(self, condition):
+        """Compiles the condition into a predicate `(gate, change) -> fired`
+
+        Expression values are looked up and normalized to strings upfront, only templated (`eval`) values are rendered
+        on each evaluation.
+        """
+        only = condition['only'].upper() if 'only' in condition.keys() else None
+        if 'expressions' not in condition.keys():
+            return lambda gate, change: gate == "ENTER" and (only is None or only == gate)
+
+        gates = [expression.upper() for expression in condition['expressions'] if isinstance(expression, str)]
+        checks = []
+        for expression in condition['expressions']:
+            if isinstance(expression, str):
+                continue
+            expression_only = expression['only'].upper() if 'only' in expression.keys() else None
+            if 'value' in expression.keys() and 'eval' in expression.keys() and expression['eval']:
+                expected = expression
+                missing = None
+            else:
+                value = self.__get_value(expression) if 'value' in expression.keys() else None
+                expected = str(value) if value is not None else None
+                missing = str(_reference_based_value(None, value))
+            checks.append((self.__get_kind(expression), self.__get_key(expression), expression_only, expected, missing))
+
+        def predicate(gate, change):
+            if only is not None and only != gate:
+                return False
+            for expression_gate in gates:
+                if expression_gate != gate:
+                    return False
+            changed = len(gates) > 0
+            if gate != "INITIALIZED" and gate != "NORMAL":
+                return changed
+
+            for kind, key, expression_only, expected, missing in checks:
+                if expression_only is not None and expression_only != gate:
+                    continue
+                if isinstance(expected, dict):  # templated value
+                    value = self.__get_value(expected)
+                    expected = str(value) if value is not None else None
+                    missing = str(_reference_based_value(None, value))
+
+                values = self.__global_state.get(kind, None)
+                current = values.get(key, None) if values is not None else None
+                current = missing if current is None else str(current)
+                if expected is not None and current != expected:
+                    return False
+
+                if not changed:
+                    if gate != "NORMAL":
+                        changed = True
+                    elif change is None:
+                        changed = current != missing
+                    elif kind == change[0] and key == change[1]:
+                        changed = current != (missing if change[2] is None else str(change[2]))
+            return changed
+
+        return predicate
+
+    def __evaluate(self, gate="NORMAL", change=None):
         """Evaluation
 
         :param gate: one of: ENTER, INITIALIZED, NORMAL
+        :param change: `(kind, key, previous value)` of the state change evaluated in the NORMAL gate. Only conditions
+                       referring to the changed device are evaluated then.
         """
         self.__transaction_start()
-        current_state = deepcopy(self.__current_state)
-        if current_state is not None and 'conditions' in current_state.keys():
-            for condition in current_state['conditions']:
-                if 'name' in current_state.keys() and 'name' in self.__current_state.keys() \
-                        and current_state['name'] == self.__current_state['name'] \
-                        and ('only' not in condition.keys() or condition['only'].upper() == gate):
-                    # self.logger.debug("Condition: " + str(condition))
-                    result = True
-                    changed = False
-                    if 'expressions' in condition.keys():
-                        for expression in condition['expressions']:
-                            additional_info = ""
-                            if isinstance(expression, str):
-                                result = result and expression.upper() == gate
-                                changed = True
-                            elif ('only' not in expression.keys() or expression['only'].upper() == gate) \
-                                    and gate in ['INITIALIZED', 'NORMAL']:
-                                value = self.__get_value(expression) if 'value' in expression.keys() else None
-                                current = _reference_based_value(self.get_state(expression), value)
-                                previous = _reference_based_value(self.get_state(expression, state=previous_state)
-                                                                  if previous_state is not None else None, value)
-
-                                result = result and (value is None or str(current) == str(value))
-                                changed = changed or str(current) != str(previous) or gate != "NORMAL"
-                                additional_info = str(previous) + " -> " + str(current) + " ?= " + str(value)
-                            self.logger.debug("Expression: " + self.__get_descriptor(expression) +
-                                              " in state " + current_state['name'] + "[" + gate + "] " +
-                                              additional_info + " => " + str(result) +
-                                              (" CHANGED " if changed else " UNCHANGED "))
-                    else:
-                        result = gate == "ENTER"
-                        changed = True
-
-                    if 'name' in current_state.keys() and 'name' in self.__current_state.keys() \
-                            and current_state['name'] == self.__current_state['name'] \
-                            and result and changed:
-                        # expression = condition['expressions'] if 'expressions' in condition.keys() else None
-                        self.logger.debug("Condition in " + current_state['name'] + "[" + gate + "] state FIRED!")
-                        if 'actions' in condition.keys():
-                            for action in condition['actions']:
-                                self.logger.debug(" -> action: " + self.__get_descriptor(action) + " = " +
-                                                  str(self.__get_value(action)))
-                                if 'only' not in action.keys() or action['only'].upper() == gate:
-                                    self.__execute(action, gate in ['INITIALIZED', 'NORMAL'])
+        try:
+            self.__evaluate_conditions(gate, change)
+        finally:
+            self.__transaction_end()
+
+    def __evaluate_conditions(self, gate, change):
+        current_state = self.__current_state
+        if current_state is not None and current_state['name'] in self.__predicates:
+            name = current_state['name']
+            predicates = self.__predicates[name]
+            if change is not None:
+                index = self.__indices[name]
+                indices = index.get((change[0], change[1]), index[None])
+            else:
+                indices = range(len(predicates))
 
-        self.__transaction_end()
+            for idx in indices:
+                if self.__current_state is not None and name == self.__current_state['name'] \
+                        and predicates[idx](gate, change):
+                    condition = current_state['conditions'][idx]
+                    self.logger.debug("Condition %s in %s[%s] state FIRED!", idx, name, gate)
+                    if 'actions' in condition.keys():
+                        for action in condition['actions']:
+                            self.logger.debug(lambda: " -> action: " + self.__get_descriptor(action) + " = " +
+                                              str(self.__get_value(action)))
+                            if 'only' not in action.keys() or action['only'].upper() == gate:
+                                self.__execute(action, gate in ['INITIALIZED', 'NORMAL'])
 
     def __transaction_start(self):
+        """Enters a transaction, the state changes, evaluations and the action queue are guarded by a reentrant lock"""
         if self.__transactional:
-            while self.__under_change:
-                time.sleep(0.05)
-
-            self.__under_change = True
+            self.__lock.acquire()
 
     def __transaction_end(self):
+        """Leaves a transaction, wakes up the looper if actions were queued"""
         if self.__transactional:
-            self.__under_change = False
+            if len(self.__actions) > 0:
+                self.__actions_queued.notify()
+            self.__lock.release()
 
     def __execute(self, action, with_goto=True):
         if self.__transactional:
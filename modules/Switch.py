@@ -13,6 +13,8 @@ from lib.ModuleLooper import ModuleLooper
 class Switch(ModuleLooper):
     """Switch module"""
 
+    events = ['on_switch_change']
+
     PATTERN_FADEIN = "fade-in"
     PATTERN_FADEOUT = "fade-out"
 
@@ -66,9 +68,7 @@ class Switch(ModuleLooper):
         if update and self.module_mqtt is not None:
             self.module_mqtt.publish("", str(value), module=self)
             self.module_mqtt.publish("percent", int(value * 100.0 / 255.0))
-            for listener in self.listeners:
-                if hasattr(listener, 'on_switch_change'):
-                    listener.on_switch_change(value)
+            self.notify_listeners('on_switch_change', value)
 
     def looper(self):
         if (self.__pattern == self.PATTERN_FADEIN or self.__pattern == self.PATTERN_FADEOUT) \
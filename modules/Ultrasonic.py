@@ -13,6 +13,8 @@ from lib.ModuleLooper import ModuleLooper
 class Ultrasonic(ModuleLooper):
     """Ultrasonic sensor module"""
 
+    events = ['on_distance_change']
+
     __delay = 0
     __handlers = []
 
@@ -72,9 +74,7 @@ class Ultrasonic(ModuleLooper):
         self.logger.info("Distance: " + str(distance) + "mm")
         if self.module_mqtt is not None:
             self.module_mqtt.publish("", str(distance), module=self)
-        for listener in self.listeners:
-            if hasattr(listener, 'on_distance_change'):
-                listener.on_distance_change(distance)
+        self.notify_listeners('on_distance_change', distance)
         for handler in self.__handlers:
             handler(distance)
         time.sleep(self.__delay)
@@ -4,11 +4,15 @@
 #
 # Direct port of the Arduino NeoPixel library strandtest example.  Showcases
 # various animations on a strip of NeoPixels.
+import hashlib
 import json
 
 from neopixel import *
 
 from lib.ColorGRB import ColorGRB
+from lib.FrameCache import FrameCache
+from lib.FrameClock import FrameClock
+from lib.FrameRenderer import FrameRenderer, push
 from lib.ModuleLooper import *
 
 
@@ -89,17 +93,9 @@ class Config(object):
                       color12=self.color12, wait=self.wait, width=self.width, fading=self.fading, minimum=self.min,
                       maximum=self.max)
 
-
-def wheel(pos):
-    """Generate rainbow colors across 0-255 positions."""
-    if pos < 85:
-        return ColorGRB(pos * 3, 255 - pos * 3, 0)
-    elif pos < 170:
-        pos -= 85
-        return ColorGRB(255 - pos * 3, 0, pos * 3)
-    else:
-        pos -= 170
-        return ColorGRB(0, pos * 3, 255 - pos * 3)
+    def digest(self):
+        """Hash of the config's content"""
+        return hashlib.sha1(json.dumps(vars(self), sort_keys=True).encode('utf-8')).hexdigest()
 
 
 class WS281x(ModuleLooper):
@@ -134,313 +130,134 @@ class WS281x(ModuleLooper):
     module_serial_reader = None
     module_bluetooth = None
 
-    def __init__(self, startup_file=None, led_count=50, row_led_count=24, row_count=2, reverse=False, debug=False):
+    def __init__(self, startup_file=None, led_count=50, row_led_count=24, row_count=2, reverse=False,
+                 frame_cache_size=8192, debug=False):
         super(WS281x, self).__init__(debug=debug)
         # Create NeoPixel object with appropriate configuration.
         self.__startup_file = startup_file
         self.__led_count = led_count
-        self.__row_led_count = row_led_count
-        self.__row_count = row_count
-        self.__rest_count = int(self.__led_count - (self.__row_led_count * self.__row_count))
         self.__reverse = reverse
+        self.__renderer = FrameRenderer(led_count, row_led_count, row_count)
+        self.__cache = FrameCache(frame_cache_size * 1024) if frame_cache_size > 0 else None
+        self.__clock = FrameClock()
         self.__strip = Adafruit_NeoPixel(self.__led_count, self.LED_PIN, self.LED_FREQ_HZ, self.LED_DMA,
                                          self.LED_INVERT, self.LED_BRIGHTNESS, self.LED_CHANNEL, self.LED_STRIP)
         # Intialize the library (must be called once before other functions).
         self.__strip.begin()
 
-    def __set_pixel_color(self, num, color):
-        num_safe = self.__led_count - num - 1 if self.__reverse else num
-        # self.logger.debug("Pixel: " + str(num_safe) + " color: " + dump_color(color))
-        self.__strip.setPixelColor(num_safe, color)
-
-    def __color_id__(self, config, position):
-        color_count = 0
-        while hasattr(config, 'color' + str(color_count + 1)) \
-                and getattr(config, 'color' + str(color_count + 1), None) is not None:
-            color_count = color_count + 1
-
-        if position.startswith('top'):
-            num = int(position.split("-")[1]) % self.__rest_count
-            color_num = color_count - self.__rest_count + num
+    def __play(self, frames):
+        """Shows the `frames` on their deadlines.
+
+        The next frame is rendered before the current one is shown so it is ready on time and so the last frame, which
+        is never dropped, is known.
+        """
+        current = None
+        for upcoming in frames:
+            if current is not None:
+                self.__show(current[0], current[1])
+            current = upcoming
+        if current is not None:
+            self.__show(current[0], current[1], last=True)
+
+    def __show(self, frame, wait, last=False):
+        if self.__clock.due(wait, last):
+            push(self.__strip, frame[::-1] if self.__reverse else frame)
+            self.__strip.show()
+            self.__clock.tick(wait)
+
+    def __animate(self, config, render):
+        """Plays the `config` rendered by `render`.
+
+        Stateless patterns are compiled into the frame cache on their first play and replayed from there afterwards.
+        """
+        if self.__cache is None or config.pattern not in FrameRenderer.STATELESS:
+            self.__play(render(config))
+            return
+
+        key = config.digest()
+        animation = self.__cache.get(key)
+        if animation is not None:
+            frames, waits = animation
+            self.__play(zip(frames, waits.tolist()))
+            self.__renderer.buffer = frames[-1]
         else:
-            num = int(position)
-            color_num = num % (color_count - self.__rest_count)
-
-            # group = num - (num % 2)
-            # group_color_num = group * 2
-            # color_num = group_color_num + (num % 2)
-            # if variation == "B": color_num = color_num + 2
-        color_key = 'color' + str(color_num + 1)
-        # self.logger.debug("ColorID: " + position + " -> " + color_key)
-        return color_key
-
-    def __color__(self, config, position, value=None):
-        if value is not None:
-            setattr(config, self.__color_id__(config, position), value)
-        return getattr(config, self.__color_id__(config, position))
+            self.__play(self.__compile(key, render(config)))
+
+    def __compile(self, key, frames):
+        """Passes the `frames` through while collecting them for the frame cache."""
+        compiled = []
+        waits = []
+        for frame, wait in frames:
+            if compiled is not None:
+                compiled.append(frame)
+                waits.append(wait)
+                if not self.__cache.fits(len(compiled), frame.nbytes):
+                    compiled = None
+            yield frame, wait
+
+        if compiled is not None:
+            self.__cache.put(key, compiled, waits)
+            self.logger.debug("Cached " + str(len(compiled)) + " frames, " + str(len(self.__cache)) + " animations in "
+                              + str(self.__cache.size / 1024) + "kB")
 
     # Define functions which animate LEDs in various ways.
     def color_wipe(self, color, wait_ms=50):
         """Wipe color across display a pixel at a time."""
-        for i in range(self.__led_count):
-            self.__set_pixel_color(i, color)
-            self.__strip.show()
-            time.sleep(wait_ms / 1000.0)
+        self.__play(self.__renderer.color_wipe(color, wait_ms))
 
     def theater(self, config):
         """Movie theater light style chaser animation."""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for j in range(config.fading):  # iterations
-            for q in range(3):
-                for i in range(0, self.__row_led_count, 3):
-                    for row in range(self.__row_count):
-                        self.__set_pixel_color(i + q + (row * self.__row_led_count), self.__color__(config, str(row)))
-                    self.__strip.show()
-                time.sleep(config.wait / 1000.0)
-                for i in range(0, self.__row_led_count, 3):
-                    for row in range(self.__row_count):
-                        self.__set_pixel_color(i + q + (row * self.__row_led_count), 0)
+        self.__animate(config, self.__renderer.theater)
 
     def rainbow(self, config):
         """Draw rainbow that fades across all pixels at once."""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for j in range(256 * config.fading):  # iterations
-            for i in range(self.__row_count * self.__row_led_count):
-                self.__set_pixel_color(i, wheel((i + j) & 255))
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.rainbow)
 
     def rainbow_cycle(self, config):
-        """Draw rainbow that uniformly distributes itself.__across all pixels."""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for j in range(256 * config.fading):  # iterations
-            for i in range(self.__row_count * self.__row_led_count):
-                self.__set_pixel_color(i, wheel((int(i * 256 / self.__led_count) + j) & 255))
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        """Draw rainbow that uniformly distributes itself across all pixels."""
+        self.__animate(config, self.__renderer.rainbow_cycle)
 
     def theater_chase_rainbow(self, config):
         """Rainbow movie theater light style chaser animation."""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for j in range(256):
-            for q in range(3):
-                for i in range(0, self.__row_count * self.__row_led_count, 3):
-                    self.__set_pixel_color(i + q, wheel((i + j) % 255))
-                self.__strip.show()
-                time.sleep(config.wait / 1000.0)
-                for i in range(0, self.__row_count * self.__row_led_count, 3):
-                    self.__set_pixel_color(i + q, 0)
+        self.__animate(config, self.__renderer.theater_chase_rainbow)
 
     # Mine
 
     def wipe(self, config):
         """Wipe color across display a pixel at a time."""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for i in range(self.__row_led_count):
-            for row in range(self.__row_count):
-                self.__set_pixel_color(i + (row * self.__row_led_count), self.__color__(config, str(row)))
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
-        if config.fading > 0:
-            time.sleep(config.fading / 1000.0)
-            copy = config.clone()
-            for row in range(self.__row_count):
-                self.__color__(copy, str(row), 0)
-            copy.fading = 0
-            self.wipe(copy)
+        self.__animate(config, self.__renderer.wipe)
 
     def light(self, config):
         """Light"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-        for row in range(self.__row_count):
-            for i in range(self.__row_led_count):
-                self.__set_pixel_color(i + (row * self.__row_led_count), self.__color__(config, str(row)))
-        self.__strip.show()
-        time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.light)
 
     def rotation(self, config):
         """Rotation"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for i in range(self.__row_led_count):
-            for j in range(self.__row_led_count * self.__row_count):
-                self.__set_pixel_color(j, 0)
-            for row in range(self.__row_count):
-                # white = (color1 & (255 << 24)) >> 24
-                red = (self.__color__(config, str(row)) & (255 << 8)) >> 8
-                green = (self.__color__(config, str(row)) & (255 << 16)) >> 16
-                blue = (self.__color__(config, str(row)) & 255)
-
-                for w in range(config.width):
-                    percent = max(100.0 - float(config.width - w - 1) * float(config.fading), 0.0)
-                    factor = percent / 100.0
-                    color = ColorGRB(int(float(red) * factor), int(float(green) * factor), int(float(blue) * factor))
-                    j = i + w if (i + w < self.__row_led_count) else (i + w) - self.__row_led_count
-                    self.__set_pixel_color(j + (row * self.__row_led_count), color)
-
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.rotation)
 
     def spin(self, config):
         """Spin"""
-        use = config.clone()
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(use, "top-" + str(i)))
-        for w in range(5):
-            use.width = self.__row_led_count
-            use.fading = 100 / self.__row_led_count
-            use.wait = 50 - (w * 10)
-            self.rotation(use)
-        for w in range(3):
-            use.width = self.__row_led_count / 2
-            use.fading = 100 / (self.__row_led_count / 2)
-            use.wait = 30 - (w * 10)
-            self.lighthouse(use)
-            self.lighthouse(use)
-            use.wait = 50
-        self.light(use)
-        time.sleep(10)
+        self.__animate(config, self.__renderer.spin)
 
     def chaise(self, config):
         """Chaice"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for i in range(self.__row_led_count):
-            for j in range(self.__row_led_count * self.__row_count):
-                self.__set_pixel_color(j, 0)
-            for w in range(config.width):
-                for row in range(self.__row_count):
-                    # white = (color1 & (255 << 24)) >> 24
-                    red = (self.__color__(config, str(row)) & (255 << 8)) >> 8
-                    green = (self.__color__(config, str(row)) & (255 << 16)) >> 16
-                    blue = (self.__color__(config, str(row)) & 255)
-
-                    percent = max(100.0 - float(config.width - w - 1) * float(config.fading), 0.0)
-                    factor = percent / 100.0
-
-                    color = ColorGRB(int(float(red) * factor), int(float(green) * factor), int(float(blue) * factor))
-                    if row < self.__row_count / 2:
-                        j = i + w if (i + w < self.__row_led_count) else (i + w) - self.__row_led_count
-                    else:
-                        j = self.__row_led_count - (i + w) - 1 if (self.__row_led_count > i + w) \
-                            else (self.__row_led_count - (i + w) - 1) + self.__row_led_count
-                    self.__set_pixel_color(j + (row * self.__row_led_count), color)
-
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.chaise)
 
     def lighthouse(self, config):
         """Lighthouse"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for i in range(self.__row_led_count):
-            for j in range(self.__row_led_count * self.__row_count):
-                self.__set_pixel_color(j, 0)
-            for row in range(self.__row_count):
-                # white1 = (self.__color__(config, str(row * 2)) & (255 << 24)) >> 24
-                red1 = (self.__color__(config, str(row)) & (255 << 8)) >> 8
-                green1 = (self.__color__(config, str(row)) & (255 << 16)) >> 16
-                blue1 = (self.__color__(config, str(row)) & 255)
-                # white2 = (color2 & (255 << 24)) >> 24
-                red2 = (self.__color__(config, str(row + self.__row_count)) & (255 << 8)) >> 8
-                green2 = (self.__color__(config, str(row + self.__row_count)) & (255 << 16)) >> 16
-                blue2 = (self.__color__(config, str(row + self.__row_count)) & 255)
-
-                for w in range(config.width):
-                    percent = max(100.0 - float(config.width - w - 1) * float(config.fading), 0.0)
-                    factor = percent / 100.0
-                    color1 = ColorGRB(int(float(red1) * factor), int(float(green1) * factor),
-                                      int(float(blue1) * factor))
-                    color2 = ColorGRB(int(float(red2) * factor), int(float(green2) * factor),
-                                      int(float(blue2) * factor))
-
-                    half = self.__row_led_count / 2
-                    j = i + w if (i + w < self.__row_led_count) else (i + w) - self.__row_led_count
-                    q = j + half if (j + half < self.__row_led_count) else (j + half) - self.__row_led_count
-
-                    self.__set_pixel_color(j + (row * self.__row_led_count), color1)
-                    self.__set_pixel_color(q + (row * self.__row_led_count), color2)
-
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.lighthouse)
 
     def fade(self, config):
         """Fade"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for step in range((config.max - config.min) * 2):
-            percent = step + config.min if ((step + config.min) < config.max) else \
-                config.max - (step + config.min - config.max)
-            factor = float(percent) / 100.0
-
-            for row in range(self.__row_count):
-                # white1 = (self.__color__(config, str(row)) & (255 << 24)) >> 24
-                red = (self.__color__(config, str(row)) & (255 << 8)) >> 8
-                green = (self.__color__(config, str(row)) & (255 << 16)) >> 16
-                blue = (self.__color__(config, str(row)) & 255)
-                color = ColorGRB(int(float(red) * factor), int(float(green) * factor), int(float(blue) * factor))
-                for i in range(self.__row_led_count):
-                    self.__set_pixel_color(i + (row * self.__row_led_count), color)
-
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.fade)
 
     def fade_toggle(self, config):
         """Fade Toggle"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for step in range((config.max - config.min) * 2):
-            percent = step + config.min if ((step + config.min) < config.max) else \
-                config.max - (step + config.min - config.max)
-
-            for row in range(self.__row_count):
-                if row < self.__row_count / 2:
-                    factor = float(percent) / 100.0
-                else:
-                    factor = float(config.max - percent + config.min) / 100.0
-                # white1 = (self.__color__(config, str(row)) & (255 << 24)) >> 24
-                red = (self.__color__(config, str(row)) & (255 << 8)) >> 8
-                green = (self.__color__(config, str(row)) & (255 << 16)) >> 16
-                blue = (self.__color__(config, str(row)) & 255)
-                color = ColorGRB(int(float(red) * factor), int(float(green) * factor), int(float(blue) * factor))
-                for i in range(self.__row_led_count):
-                    self.__set_pixel_color(i + (row * self.__row_led_count), color)
-
-            self.__strip.show()
-            time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.fade_toggle)
 
     def blink(self, config):
         """Blink"""
-        for i in range(self.__rest_count):
-            self.__set_pixel_color(self.__led_count - i - 1, self.__color__(config, "top-" + str(i)))
-
-        for row in range(self.__row_count):
-            for i in range(self.__row_led_count):
-                self.__set_pixel_color(i + (row * self.__row_led_count), self.__color__(config, str(row)))
-        self.__strip.show()
-        time.sleep(config.wait / 1000.0)
-
-        for row in range(self.__row_count):
-            for i in range(self.__row_led_count):
-                self.__set_pixel_color(i + (row * self.__row_led_count), 0)
-        self.__strip.show()
-        time.sleep(config.wait / 1000.0)
+        self.__animate(config, self.__renderer.blink)
 
     def finalize(self):
         super(WS281x, self).finalize()
@@ -533,6 +350,9 @@ class WS281x(ModuleLooper):
             except ValueError:
                 self.logger.error('Oops!  That was no valid JSON.  Try again...')
                 traceback.print_exc()
+        elif len(path) == 1 and path[0] == "stats":  # {service}/control/ws281x/stats
+            if self.module_mqtt is not None:
+                self.module_mqtt.publish("stats", json.dumps(self.__clock.stats()), module=self)
         elif len(path) == 1 and path[0] == "add":
             try:
                 extension = to_configs(json.loads(payload))
@@ -614,7 +434,7 @@ class WS281x(ModuleLooper):
             elif config.pattern == 'rainbowCycle':
                 self.rainbow_cycle(config)
             elif config.pattern == 'wait':
-                time.sleep(config.wait / 1000.0)
+                self.__clock.sleep(config.wait)
             else:
                 self.fade(Config(color1=ColorGRB(16, 16, 16),
                                  color2=ColorGRB(16, 16, 16),
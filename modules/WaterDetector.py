@@ -11,6 +11,8 @@ from lib.Module import Module
 class WaterDetector(Module):
     """Water detector module with Flying Fish MH Sensor"""
 
+    events = ['on_water_change']
+
     module_mqtt = None
 
     def __init__(self, pin=23, debug=False):
@@ -31,9 +33,7 @@ class WaterDetector(Module):
         if self.module_mqtt is not None:
             self.module_mqtt.publish("", "OPEN" if state else "CLOSED", module=self)
 
-        for listener in self.listeners:
-            if hasattr(listener, 'on_water_change'):
-                listener.on_water_change(state)
+        self.notify_listeners('on_water_change', state)
 
     def __water__(self, pin):
         state = not GPIO.input(pin)
@@ -42,6 +42,4 @@ class WaterDetector(Module):
         if self.module_mqtt is not None:
             self.module_mqtt.publish("", "OPEN" if state else "CLOSED", module=self)
 
-        for listener in self.listeners:
-            if hasattr(listener, 'on_water_change'):
-                listener.on_water_change(state)
\ No newline at end of file
+        self.notify_listeners('on_water_change', state)
\ No newline at end of file
@@ -3,12 +3,10 @@
 #
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
-import prctl
-from threading import Timer
-
 import RPi.GPIO as GPIO
 
 from lib.Module import Module
+from lib.Scheduler import SCHEDULER
 
 
 class Wheels(Module):
@@ -148,10 +146,9 @@ class Wheels(Module):
         self.__left = left
         self.__right = right
         if timeout > 0:
-            self.__timer = Timer(timeout, self.halt).start()
+            self.__timer = SCHEDULER.schedule(timeout, self.halt)
 
     def halt(self):
-        prctl.set_name("Wheel Timer")
         self.__pwm_right.ChangeDutyCycle(0)
         self.__pwm_left.ChangeDutyCycle(0)
         GPIO.output(self.__pin_right_forward, GPIO.LOW)
@@ -4,15 +4,19 @@
 # Author: Jan Kubovy (jan@kubovy.eu)
 #
 import getopt
-import os
 import sys
+import threading
 import time
 import traceback
 from copy import deepcopy
 
+from lib.EventBus import BUS
 from lib.FileWatcherHandler import observe
-from lib.Logger import Logger
-from lib.Util import to_snake_case
+from lib.Logger import Logger, configure as configure_logger
+from lib.ModuleRegistry import ModuleRegistry
+from lib.Scheduler import SCHEDULER, Scheduler
+from lib.StartupProfiler import StartupProfiler
+from lib.Util import monotonic, to_snake_case
 
 REQUIRED_STRING = "REQUIRED"
 REQUIRED_INT = -1
@@ -69,7 +73,19 @@ module_parameters = {
         'client-id': [REQUIRED_STRING, "", ""],
         'start': [True, "", "Starts MQTT"],
         'host': [REQUIRED_STRING, "host", "MQTT host"],
-        'port': [1883, "port", "MQTT port (default: 1883)"]
+        'port': [1883, "port", "MQTT port (default: 1883)"],
+        'deadbands': [[], "module:deadband[,module:deadband[,...]]",
+                      "Suppress publishes changing less than the deadband, 0 suppresses repeated values only, "
+                      "* applies to all modules (default: none)"],
+        'min-intervals': [[], "module:seconds[,module:seconds[,...]]",
+                          "Minimal interval between publishes to the same topic, the latest value is published at the "
+                          "end of the interval, * applies to all modules (default: none)"],
+        'queue-size': [1000, "count", "Messages kept while disconnected from the broker (default: 1000)"],
+        'queue-file': ["", "file", "File to keep the messages not sent yet in between restarts (default: none)"],
+        'json-modules': [[], "module[,module[,...]]",
+                         "Publish the state of the modules as one JSON document, * applies to all modules "
+                         "(default: none)"],
+        'json-compat': [False, "", "Publish also the separate state topics of the modules in JSON mode"]
     },
     'PanTilt': {
         'enable-lights': [True, "", "Enable lights"],
@@ -128,6 +144,7 @@ module_parameters = {
         'row-led-count': [24, "count", "LED count in one row (default 24)"],
         'row-count': [2, "count", "Number of rows (default 2)"],
         'reverse': [False, "", "Reverse LED order"],
+        'frame-cache-size': [8192, "kB", "Memory for cached animation frames, 0 disables the cache (default 8192)"],
         'start': [False, "", "Starts WS281x"]
     },
     'WS281xIndicators': {
@@ -139,18 +156,43 @@ module_parameters = {
 parameter_values = {}
 
 client_id = None
+registry = ModuleRegistry('modules')
 modules = []
+startup_timings = {}
 
 gpio_modules = ["Buzzer", "InfraredReceiver", "InfraredSensor", "Joystick", "MotionDetector", "TrackingSensor",
                 "Ultrasonic", "WaterDetector", "Wheels"]
 gpio_loaded = False
 
+hardware_backends = ["pi", "simulator", "simulator-instant"]
+hardware = "pi"
+
+runtimes = ["threads", "asyncio"]
+runtime = "threads"
+
+profiler = None
+profile_file = None
+
 interrupted = False
 
 
 def initialize(module_names):
     global modules, debug, gpio_loaded
 
+    if hardware != "pi":
+        from lib import Simulator
+        logger.info("Using simulated hardware" + (" without latency" if hardware == "simulator-instant" else ""))
+        Simulator.install(with_latency=hardware == "simulator")
+
+    if runtime == "asyncio":
+        try:
+            from lib.AsyncRuntime import AsyncRuntime
+        except (ImportError, SyntaxError):
+            logger.exception("The asyncio runtime requires Python 3")
+        from lib.ModuleLooper import ModuleLooper
+        logger.info("Running loopers on an asyncio event loop")
+        ModuleLooper.runtime = AsyncRuntime()
+
     if [i for i in gpio_modules if i in module_names]:
         import RPi.GPIO as GPIO
         GPIO.setmode(GPIO.BCM)
@@ -158,45 +200,99 @@ def initialize(module_names):
         gpio_loaded = True
 
     logger.info("Loading modules: " + str(module_names))
+    startup = monotonic()
 
-    for module_file in sorted(os.listdir('modules')):
-        if module_file.endswith(".py") and module_file != "__init__.py":
-            module_name = module_file[:-3]
+    names = [module_name for module_name in registry.names() if module_name in module_names]
+    for module_name in names:
+        startup_timings[module_name] = {}
+        timed(module_name, 'import', registry.load, module_name)
+    dependencies, stages = registry.resolve(names)
+    names = [module_name for stage in stages for module_name in stage]  # Dependencies first
 
-            if module_name in module_names:
-                module = __import__("modules." + module_name, fromlist=[module_name])
-                clazz = getattr(module, module_name)
-                attributes = deepcopy(parameter_values[module_name]) if module_name in parameter_values.keys() else {}
-                attributes['debug'] = debug
-                attributes.pop('start', None)
-                logger.debug("Instantiating " + str(clazz.__name__) + "(" + str(attributes) + ")")
-                instance = clazz(**attributes)
-                modules.append(instance)
+    instances = instantiate(stages)
+    modules.extend([instances[module_name] for module_name in names])
 
     logger.debug("Loaded modules: " + str(modules))
-    for module in modules:
-        for module_name in module_names:
-            if module_name != type(module).__name__:
-                module_property = "module_" + to_snake_case(module_name)
-                if hasattr(module, module_property):
-                    import_module = __import__("modules." + module_name, fromlist=[module_name])
-                    clazz = getattr(import_module, module_name)
-                    injectee = next((i for i in modules if isinstance(i, clazz)), None)
-                    if injectee is not None:
-                        logger.debug("Injecting " + type(injectee).__name__ + " into " + type(module).__name__ + "." +
-                                     module_property)
-                        setattr(module, module_property, injectee)
-                        if hasattr(injectee, 'register'):
-                            getattr(injectee, 'register')(module)
-
-    for module in modules:
-        module.initialize()
-
-    for module in modules:
-        if type(module).__name__ in parameter_values \
-                and 'start' in parameter_values[type(module).__name__] \
-                and parameter_values[type(module).__name__]['start']:
-            module.start()
+    for module_name in names:
+        module = instances[module_name]
+        for dependency in dependencies[module_name]:
+            injectee = instances.get(dependency, None)
+            if injectee is not None:
+                module_property = registry.property(dependency)
+                logger.debug("Injecting %s into %s.%s", dependency, module_name, module_property)
+                setattr(module, module_property, injectee)
+                if hasattr(injectee, 'register'):
+                    getattr(injectee, 'register')(module)
+
+    for module_name in names:
+        timed(module_name, 'initialize', instances[module_name].initialize)
+
+    for module_name in names:
+        if module_name in parameter_values \
+                and 'start' in parameter_values[module_name] \
+                and parameter_values[module_name]['start']:
+            timed(module_name, 'start', instances[module_name].start)
+
+    for module_name in names:
+        logger.info("Started %s in %.3fs (%s)", module_name, sum(startup_timings[module_name].values()),
+                    ", ".join(phase + ": %.3fs" % startup_timings[module_name][phase]
+                              for phase in ['import', 'construct', 'initialize', 'start']
+                              if phase in startup_timings[module_name]))
+    logger.info("Started %d modules in %.3fs", len(names), monotonic() - startup)
+
+    if profiler is not None:
+        profiler.uninstall()
+        try:
+            profiler.write(profile_file, startup_timings)
+            logger.info("Startup profile written to %s", profile_file)
+        except IOError:
+            logger.error("Writing startup profile to %s failed", profile_file)
+            traceback.print_exc()
+
+
+def timed(module_name, phase, function, *args, **kwargs):
+    """Calls the `function` recording its duration as the `phase` of the module's startup"""
+    start = monotonic()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        startup_timings[module_name][phase] = monotonic() - start
+
+
+def instantiate(stages):
+    """Instantiates the modules stage by stage (see `ModuleRegistry.resolve`), the modules of a stage concurrently.
+
+    Modules depending on each other (directly or indirectly) are instantiated concurrently as well, the dependencies are
+    injected only after all the modules are instantiated anyway.
+    """
+    instances = {}
+    errors = []
+
+    def construct(module_name):
+        try:
+            clazz = registry.load(module_name)
+            attributes = deepcopy(parameter_values[module_name]) if module_name in parameter_values.keys() else {}
+            attributes['debug'] = debug
+            attributes.pop('start', None)
+            logger.debug("Instantiating %s(%s)", module_name, attributes)
+            instances[module_name] = timed(module_name, 'construct', clazz, **attributes)
+        except:
+            traceback.print_exc()
+            errors.append(sys.exc_info()[1])
+
+    for stage in stages:
+        threads = [threading.Thread(target=construct, args=[module_name], name="Init " + module_name)
+                   for module_name in stage]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if len(errors) > 0:
+            break
+
+    if len(errors) > 0:
+        raise errors[0]
+    return instances
 
 
 def looper():
@@ -218,13 +314,24 @@ def looper():
         observer.stop()
         observer.join(1.0)
 
-        for module in modules:
+        for module in reversed(modules):  # Dependents first
             module.stop()
 
-        for module in modules:
-            logger.debug("Finalizing module %s..." % type(module))
+        for module in reversed(modules):
+            logger.debug("Finalizing module %s...", type(module))
             module.finalize()
 
+        logger.debug("Stopping event bus...")
+        BUS.shutdown()
+
+        logger.debug("Stopping scheduler...")
+        SCHEDULER.shutdown()
+
+        from lib.ModuleLooper import ModuleLooper
+        if ModuleLooper.runtime is not None:
+            logger.debug("Stopping runtime...")
+            ModuleLooper.runtime.stop()
+
         if gpio_loaded:
             logger.debug("Cleaning up GPIO...")
             import RPi.GPIO as GPIO
@@ -237,12 +344,22 @@ def help():
 Options:
   -h, --help                                 This screen
   -d, --debug                                This screen
-  -m, --module name[,name[,...]]             One or more modules to load""")
-    for module_file in sorted(os.listdir('modules')):
-        if module_file.endswith(".py") and module_file != "__init__.py":
-            module_name = module_file[:-3]
-            print("      ", to_snake_case(module_name, separator="-").ljust(20), ": ", \
-                to_snake_case(module_name, separator=" ", case=None))
+  -m, --module name[,name[,...]]             One or more modules to load
+      --hardware=pi|simulator|simulator-instant
+                                             Hardware backend: the Raspberry Pi (default), in-process simulators
+                                             with realistic latency or in-process simulators without latency
+      --runtime=threads|asyncio              Run every looper in its own thread (default) or all loopers on one
+                                             asyncio event loop (Python 3 only)
+      --log-file=file                        Log file, empty for none (default: /var/log/raspi-project.log)
+      --log-ring-size=count                  Last log records kept in memory per module, dumped on
+                                             {service}/control/logger/dump (default: 100)
+      --async-events                         Deliver the modules' events to their listeners in worker threads, so
+                                             a slow listener does not stall the module notifying it
+      --profile-startup=file                 Write a JSON breakdown of the startup time (imports, and every
+                                             module's import, construction, initialization and start) to file""")
+    for module_name in registry.names():
+        print("      ", to_snake_case(module_name, separator="-").ljust(20), ": ", \
+            to_snake_case(module_name, separator=" ", case=None))
 
     for module_name, parameters in sorted(module_parameters.items(), key=lambda tupple: tupple[0]):
         print("")
@@ -255,10 +372,11 @@ Options:
 
 
 def main(argv):
-    global debug, logger, client_id, module_parameters, parameter_values
+    global debug, logger, client_id, module_parameters, parameter_values, hardware, runtime, profiler, profile_file
 
     try:
-        options = ["help", "debug", "module="]
+        options = ["help", "debug", "module=", "hardware=", "runtime=", "log-file=", "log-ring-size=",
+                   "profile-startup=", "async-events"]
         for module_name, parameters in module_parameters.items():
             module_id = to_snake_case(module_name, "-")
             for option_name, definition in parameters.items():
@@ -279,17 +397,31 @@ def main(argv):
         elif opt in ("-d", "--debug"):
             debug = True
             logger = Logger("MAIN", debug)
+        elif opt == "--hardware":
+            if arg not in hardware_backends:
+                logger.exception("Hardware " + arg + " not supported, use one of: " + ", ".join(hardware_backends))
+            hardware = arg
+        elif opt == "--runtime":
+            if arg not in runtimes:
+                logger.exception("Runtime " + arg + " not supported, use one of: " + ", ".join(runtimes))
+            runtime = arg
+        elif opt == "--log-file":
+            configure_logger(log_file=arg if arg != "" else None)
+        elif opt == "--log-ring-size":
+            configure_logger(ring_size=int(arg))
+        elif opt == "--async-events":
+            BUS.asynchronous = True
+            BUS.pool = Scheduler(workers=4)
+        elif opt == "--profile-startup":
+            profile_file = arg
+            profiler = StartupProfiler()
+            profiler.install()
         elif opt in ("-m", "--module") and arg not in module_names:
             for module_id in arg.split(","):
-                found = False
-                for module_file in sorted(os.listdir('modules')):
-                    if module_file.endswith(".py") and module_file != "__init__.py":
-                        module_name = module_file[:-3]
-                        if to_snake_case(module_name, "-") == module_id:
-                            module_names.append(module_name)
-                            found = True
-                if not found:
+                module_name = registry.name(module_id)
+                if module_name is None:
                     logger.exception("Module " + module_id + " not found!")
+                module_names.append(module_name)
 
             for module_name, parameters in module_parameters.items():
                 if module_name in module_names: